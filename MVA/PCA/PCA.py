@@ -5,6 +5,10 @@ from sklearn.decomposition import PCA
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from PCA_score_store import PCScoreStore, model_hash
+from PCA_approx import SketchPCA
+from PCA_robust import RobustPCA
+from PCA_weights import WEIGHT_COL, WeightedPCA, weighted_standardize
 
 # 設定中文字體
 plt.rcParams['font.family'] = ['Arial Unicode MS']
@@ -28,8 +32,8 @@ def load_and_prepare_data(file_path):
     
     return df
 
-def preprocess_data_for_pca(df):
-    """資料預處理"""
+def preprocess_data_for_pca(df, weights=None):
+    """資料預處理；給定調查權重時以加權平均與標準差標準化"""
     # 1. 檢查缺失值
     print("\n檢查缺失值：")
     print(df.isnull().sum())
@@ -53,19 +57,44 @@ def preprocess_data_for_pca(df):
         print(df.isnull().sum()[df.isnull().sum() > 0])
     
     # 標準化資料
-    scaler = StandardScaler()
-    scaled_data = scaler.fit_transform(df)
+    if weights is None:
+        scaler = StandardScaler()
+        scaled_data = scaler.fit_transform(df)
+    else:
+        scaled_data, mean, std = weighted_standardize(df, weights)
+        scaler = {'mean': mean, 'std': std}
     
     # 轉換為DataFrame以保留變數名稱
     scaled_df = pd.DataFrame(scaled_data, columns=df.columns)
     
     return scaled_df, scaler
 
-def perform_pca(scaled_data):
-    """執行PCA分析"""
-    # 初始化PCA
-    pca = PCA()
-    pca_result = pca.fit_transform(scaled_data)
+def perform_pca(scaled_data, approximate=False, sketch_size=32, chunksize=100000,
+                robust=False, robust_method='mcd', weights=None):
+    """
+    執行PCA分析；approximate=True 時以單次串流的矩陣草圖近似，並附誤差上界；
+    robust=True 時改用穩健 PCA，離群受訪者標記於 pca.flags；
+    給定 weights 時對加權共變異數做分解
+    """
+    if robust:
+        pca = RobustPCA(n_components=scaled_data.shape[1], method=robust_method)
+        pca.fit(scaled_data)
+        pca.print_summary()
+        pca_result = pca.scores.to_numpy()
+    elif approximate:
+        n_components = min(scaled_data.shape[1], sketch_size)
+        pca = SketchPCA(n_components=n_components, sketch_size=sketch_size)
+        values = scaled_data.to_numpy(dtype=float)
+        pca.fit_stream(values[start:start + chunksize] for start in range(0, len(values), chunksize))
+        pca.report(scaled_data.columns)
+        pca_result = pca.transform(values)
+    elif weights is not None:
+        pca = WeightedPCA()
+        pca_result = pca.fit_transform(scaled_data, weights)
+    else:
+        # 初始化PCA
+        pca = PCA()
+        pca_result = pca.fit_transform(scaled_data)
     
     # 計算解釋變異量
     explained_variance_ratio = pca.explained_variance_ratio_
@@ -147,7 +176,7 @@ def plot_biplot(pca_result, loadings, feature_names, output_dir):
     plt.savefig(os.path.join(output_dir, 'biplot_pca.png'))
     plt.close()
 
-def main():
+def main(approximate=False, robust=False):
     try:
         print("開始執行PCA分析...")
         output_dir = create_output_directory()
@@ -160,15 +189,20 @@ def main():
         print(f"原始資料維度：{df.shape}")
         print(f"缺失值數量：\n{df.isnull().sum()}")
 
+        # 調查權重不參與分析，只用於加權估計
+        weights = df.pop(WEIGHT_COL).to_numpy(dtype=float) if WEIGHT_COL in df.columns else None
+
         # 資料預處理
-        scaled_df, scaler = preprocess_data_for_pca(df)
+        scaled_df, scaler = preprocess_data_for_pca(df, weights)
         
         # 確認預處理後沒有缺失值
         if scaled_df.isnull().sum().any():
             raise ValueError("預處理後資料仍包含缺失值")
         
         # 執行PCA
-        pca, pca_result = perform_pca(scaled_df)
+        # 探索性分析可用 approximate=True 改為草圖近似，正式結果請用精確計算
+        pca, pca_result = perform_pca(scaled_df, approximate=approximate, robust=robust,
+                                      weights=weights)
         
         # 繪製視覺化圖表
         plot_scree(pca, output_dir)
@@ -188,8 +222,23 @@ def main():
             pca_result[:, :n_components],
             columns=[f'PC{i+1}' for i in range(n_components)]
         )
+        if robust:
+            pca_df['outlier'] = pca.flags['outlier'].to_numpy()
         pca_df.to_csv(os.path.join(output_dir, 'pca_results.csv'), index=False)
         
+        # 另存記憶體映射的得分存放區（全部主成分、受訪者 ID 與類別變數代碼）
+        scores = pd.DataFrame(
+            pca_result,
+            columns=[f'PC{i+1}' for i in range(pca_result.shape[1])],
+            index=df.index
+        )
+        PCScoreStore.write(
+            os.path.join(output_dir, 'pc_score_store'), scores,
+            df[['性別', '職業', '教育程度']], weights,
+            model_hash=model_hash(pca.components_, df.columns),
+            method='robust_pca' if robust else 'pca',
+        )
+        
         print("PCA分析完成，結果已儲存至output_figures資料夾")
         
         return pca, pca_result, loadings
@@ -0,0 +1,252 @@
+import pandas as pd
+import numpy as np
+
+
+def stratified_reservoir(path, strata, capacity=2000, chunksize=100000, derive=None, seed=0):
+    """
+    單次串流讀取，依分層建立固定大小的水庫樣本
+
+    每列給一個均勻亂數鍵，每層只保留鍵值最小的 capacity 列，等同於
+    層內簡單隨機抽樣；記憶體只與 層數 x capacity + chunksize 有關。
+
+    Parameters:
+    -----------
+    path : str
+        問卷資料 CSV
+    strata : list
+        分層欄位，例如 ['q3', 'Birth_Category']
+    derive : callable
+        對每批資料新增分層欄位的函式（例如由 q2 算出生年代組別）
+
+    Returns:
+    --------
+    sample : DataFrame
+        樣本（含 _stratum 欄位）
+    counts : Series
+        各層的母體列數（精確計數）
+    """
+    rng = np.random.default_rng(seed)
+    sample = None
+    counts = pd.Series(dtype=float)
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        if derive is not None:
+            chunk = derive(chunk)
+        chunk = chunk.assign(
+            _stratum=chunk[strata].astype(str).agg('|'.join, axis=1),
+            _key=rng.random(len(chunk))
+        )
+        counts = counts.add(chunk['_stratum'].value_counts(), fill_value=0)
+
+        sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        rank = sample.groupby('_stratum')['_key'].rank(method='first')
+        sample = sample[rank <= capacity].reset_index(drop=True)
+
+    return sample.drop(columns='_key'), counts.astype(int)
+
+
+def design_weights(sample, counts):
+    """分層樣本的設計權重 N_h / n_h"""
+    stratum = sample['_stratum']
+    return stratum.map(counts) / stratum.map(stratum.value_counts())
+
+
+def weighted_crosstab(sample, row, col, counts, n_boot=200, ci=0.95, seed=0, weights=None):
+    """
+    由分層樣本估計列百分比交叉表，並以 Poisson bootstrap 提供信賴區間
+
+    每列的設計權重為 N_h / n_h；整層皆被抽中的層（n_h = N_h）視為
+    普查，不做重抽。所有 bootstrap 複本以一次 bincount 計算。
+    weights 為調查權重時，與設計權重相乘。
+
+    Returns:
+    --------
+    pct, lower, upper : DataFrame
+        列百分比估計值與信賴區間上下限
+    """
+    rng = np.random.default_rng(seed)
+    design = design_weights(sample, counts).to_numpy(dtype=float)
+    census = design == 1.0
+    weights = design if weights is None else design * np.asarray(weights, dtype=float)
+
+    valid = sample[row].notna().to_numpy() & sample[col].notna().to_numpy()
+    r_codes, r_levels = pd.factorize(sample.loc[valid, row], sort=True)
+    c_codes, c_levels = pd.factorize(sample.loc[valid, col], sort=True)
+    weights, census = weights[valid], census[valid]
+    R, C = len(r_levels), len(c_levels)
+    cell = r_codes * C + c_codes
+
+    def row_percent(cell_totals):
+        totals = cell_totals.reshape(-1, R, C)
+        return totals / totals.sum(axis=2, keepdims=True) * 100
+
+    point = row_percent(np.bincount(cell, weights=weights, minlength=R * C))[0]
+
+    boot = rng.poisson(1.0, size=(n_boot, len(cell))).astype(float)
+    boot[:, census] = 1.0
+    flat = (np.arange(n_boot)[:, None] * R * C + cell[None, :]).ravel()
+    boot_totals = np.bincount(flat, weights=(boot * weights).ravel(), minlength=n_boot * R * C)
+    with np.errstate(invalid='ignore'):
+        boot_pct = row_percent(boot_totals)
+
+    alpha = (1 - ci) / 2
+    lower = np.nanquantile(boot_pct, alpha, axis=0)
+    upper = np.nanquantile(boot_pct, 1 - alpha, axis=0)
+
+    def frame(values):
+        out = pd.DataFrame(values, index=r_levels, columns=c_levels)
+        out.index.name, out.columns.name = row, col
+        return out
+
+    return frame(point), frame(lower), frame(upper)
+
+
+class FrequentDirections:
+    def __init__(self, n_features, sketch_size):
+        """
+        Frequent Directions 矩陣草圖 (Liberty, 2013)
+
+        保持 0 <= A.T A - B.T B <= delta * I，delta 為每次收縮所減去的
+        奇異值平方總和，在串流過程中精確累計。以 B.T B + (delta / 2) I
+        估計 A.T A 時，誤差上界為 delta / 2。
+        """
+        self.ell = sketch_size
+        self.B = np.zeros((2 * sketch_size, n_features))
+        self.next_row = 0
+        self.delta = 0.0
+
+    def _shrink(self):
+        _, s, Vt = np.linalg.svd(self.B, full_matrices=False)
+        d = s[self.ell - 1] ** 2 if len(s) >= self.ell else 0.0
+        s_new = np.sqrt(np.maximum(s[:self.ell] ** 2 - d, 0))
+        self.B[:] = 0
+        self.B[:len(s_new)] = s_new[:, None] * Vt[:self.ell]
+        self.next_row = self.ell
+        self.delta += d
+
+    def update(self, X):
+        """加入一批資料列"""
+        start = 0
+        while start < len(X):
+            free = len(self.B) - self.next_row
+            if free == 0:
+                self._shrink()
+                continue
+            block = X[start:start + free]
+            self.B[self.next_row:self.next_row + len(block)] = block
+            self.next_row += len(block)
+            start += len(block)
+
+    def gram(self):
+        """A.T @ A 的近似，誤差上界為 error_bound()"""
+        return self.B.T @ self.B + self.delta / 2 * np.eye(self.B.shape[1])
+
+    def error_bound(self):
+        """||A.T A - gram()||_2 的上界"""
+        return self.delta / 2
+
+
+class SketchPCA:
+    def __init__(self, n_components=4, sketch_size=64, standardize=False, exact=False):
+        """
+        單次串流的 PCA（預設以 Frequent Directions 近似，exact=True 時改為精確計算）
+
+        第一批資料的平均作為平移量 c，累計 (X - c) 的草圖以及精確的
+        列數、總和、平方和；共變異數由
+            C = ((X-c).T (X-c) - n (m-c)(m-c).T) / (n - 1)
+        還原，平移修正項為精確值，因此草圖的誤差上界直接適用。
+
+        介面與 sklearn 的 PCA 相容（components_、explained_variance_、
+        explained_variance_ratio_、n_components_、transform）。
+        """
+        self.n_components = n_components
+        self.sketch_size = sketch_size
+        self.standardize = standardize
+        self.exact = exact
+        self.n = 0
+        self.shift = None
+        self.sum = None
+        self.sumsq = None
+        self.sketch = None
+        self.gram_exact = None
+
+    def partial_fit(self, X):
+        """加入一批資料"""
+        X = np.asarray(X, dtype=float)
+        if self.shift is None:
+            p = X.shape[1]
+            self.shift = X.mean(axis=0)
+            self.sum = np.zeros(p)
+            self.sumsq = np.zeros(p)
+            if self.exact:
+                self.gram_exact = np.zeros((p, p))
+            else:
+                self.sketch = FrequentDirections(p, self.sketch_size)
+
+        Xc = X - self.shift
+        self.n += len(X)
+        self.sum += Xc.sum(axis=0)
+        self.sumsq += (Xc ** 2).sum(axis=0)
+        if self.exact:
+            self.gram_exact += Xc.T @ Xc
+        else:
+            self.sketch.update(Xc)
+        return self
+
+    def fit_stream(self, chunks):
+        """逐批讀入資料後完成分解"""
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self.finalize()
+
+    def finalize(self):
+        """由累計量計算主成分與誤差上界"""
+        n = self.n
+        m = self.sum / n
+        gram = self.gram_exact if self.exact else self.sketch.gram()
+        cov = (gram - n * np.outer(m, m)) / (n - 1)
+        var = (self.sumsq - n * m ** 2) / (n - 1)
+        cov_bound = 0.0 if self.exact else self.sketch.error_bound() / (n - 1)
+
+        self.mean_ = self.shift + m
+        self.scale_ = np.sqrt(var) if self.standardize else np.ones_like(var)
+        if self.standardize:
+            cov = cov / np.outer(self.scale_, self.scale_)
+            cov_bound = cov_bound / var.min()
+        total_variance = len(var) if self.standardize else var.sum()
+
+        eigvals, eigvecs = np.linalg.eigh(cov)
+        order = np.argsort(eigvals)[::-1]
+        eigvals, eigvecs = eigvals[order], eigvecs[:, order]
+
+        k = self.n_components
+        self.n_components_ = k
+        self.components_ = eigvecs[:, :k].T
+        self.explained_variance_ = eigvals[:k]
+        self.explained_variance_ratio_ = eigvals[:k] / total_variance
+
+        # Weyl：特徵值誤差 <= ||E||；Davis-Kahan：sin(角度) <= 2||E|| / 特徵值間距
+        # 兩端補 inf：第一個成分沒有上方間距，k 等於特徵數時最後一個成分沒有下方間距
+        gaps = np.concatenate([[np.inf], np.abs(np.diff(eigvals)), [np.inf]])
+        gap = np.minimum(gaps[:k], gaps[1:k + 1])
+        self.eigenvalue_bound_ = cov_bound
+        self.variance_ratio_bound_ = cov_bound / total_variance
+        self.angle_bound_ = np.minimum(2 * cov_bound / gap, 1.0)
+        return self
+
+    def transform(self, X):
+        """投影至主成分"""
+        return ((np.asarray(X, dtype=float) - self.mean_) / self.scale_) @ self.components_.T
+
+    def report(self, feature_names, top=5, n_components=4):
+        """列印前 n_components 個主成分的主要負荷量與誤差上界"""
+        mode = '精確' if self.exact else f'近似（草圖大小 {self.sketch_size}）'
+        print(f"\n串流 PCA 結果（{mode}，n = {self.n}）:")
+        print("=" * 50)
+        print(f"特徵值誤差上界: ±{self.eigenvalue_bound_:.4f}")
+        for i in range(min(n_components, self.n_components_)):
+            loadings = pd.Series(self.components_[i], index=feature_names)
+            top_loadings = loadings.reindex(loadings.abs().sort_values(ascending=False).index[:top])
+            print(f"\nPC{i+1}: 解釋變異量 {self.explained_variance_ratio_[i]:.2%} "
+                  f"± {self.variance_ratio_bound_:.2%}，負荷向量角度誤差 sin θ <= {self.angle_bound_[i]:.3f}")
+            print(top_loadings.round(3).to_string())
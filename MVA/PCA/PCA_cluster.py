@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.mixture import GaussianMixture
+from sklearn.metrics import silhouette_score
+from PCA_score_store import DEFAULT_STORE_DIR, open_or_build
+
+
+def _score_k(sample, k, method, random_state):
+    """對單一 k 值在子樣本上計算選模指標（越大越好）"""
+    if method == 'bic':
+        gmm = GaussianMixture(n_components=k, random_state=random_state).fit(sample)
+        return k, -gmm.bic(sample)
+
+    km = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3).fit(sample)
+    return k, silhouette_score(sample, km.labels_,
+                               sample_size=min(len(sample), 5000),
+                               random_state=random_state)
+
+
+class PCSegmenter:
+    def __init__(self, score_path, pc_cols=None, group_cols=None, chunksize=100000):
+        """
+        初始化主成分得分分群器
+
+        Parameters:
+        -----------
+        score_path : str
+            主成分得分 CSV（每列一位受訪者，含 PC 欄位與分組欄位）
+        pc_cols : list
+            用於分群的主成分欄位，預設 PC1-PC4
+        group_cols : list
+            要交叉的人口變數，預設性別、地區、年齡組別
+        chunksize : int
+            每次讀取的列數，記憶體用量只與此值有關
+        """
+        self.score_path = score_path
+        self.pc_cols = pc_cols or [f'PC{i+1}' for i in range(4)]
+        self.group_cols = group_cols or ['gender_label', 'region', 'age_group']
+        self.chunksize = chunksize
+        self.sample = None
+        self.k_scores = None
+        self.n_clusters = None
+        self.model = None
+        self.method = None
+
+    def _chunks(self, usecols=None):
+        """依 chunksize 逐批讀取得分檔"""
+        return pd.read_csv(self.score_path, chunksize=self.chunksize, usecols=usecols)
+
+    def draw_sample(self, sample_size=20000, random_state=0):
+        """以隨機鍵水庫抽樣取得固定大小的子樣本，只需掃描一次檔案"""
+        rng = np.random.default_rng(random_state)
+        sample = np.empty((0, len(self.pc_cols)))
+        keys = np.empty(0)
+
+        for chunk in self._chunks(usecols=self.pc_cols):
+            values = chunk[self.pc_cols].dropna().to_numpy(dtype=float)
+            sample = np.vstack([sample, values])
+            keys = np.concatenate([keys, rng.random(len(values))])
+            if len(keys) > sample_size:
+                keep = np.argpartition(keys, sample_size)[:sample_size]
+                sample, keys = sample[keep], keys[keep]
+
+        self.sample = sample
+        return sample
+
+    def choose_k(self, k_range=range(2, 9), method='silhouette', n_jobs=-1, random_state=0):
+        """
+        在子樣本上平行計算各 k 值的指標並選出最佳 k
+
+        method 為 'silhouette'（MiniBatchKMeans）或 'bic'（GaussianMixture）
+        """
+        if self.sample is None:
+            self.draw_sample(random_state=random_state)
+
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(_score_k)(self.sample, k, method, random_state) for k in k_range
+        )
+        self.k_scores = pd.Series(dict(results), name=method)
+        self.n_clusters = int(self.k_scores.idxmax())
+        self.method = method
+
+        print(f"\n分群數選擇（{method}）:")
+        print("=" * 50)
+        print(self.k_scores.round(4))
+        print(f"最佳分群數: {self.n_clusters}")
+        return self.n_clusters
+
+    def fit(self, batch_size=4096, random_state=0):
+        """
+        訓練分群模型
+
+        KMeans 以 partial_fit 逐批串流整個檔案；
+        GaussianMixture 不支援增量訓練，改在子樣本上估計。
+        """
+        if self.method == 'bic':
+            self.model = GaussianMixture(n_components=self.n_clusters,
+                                         random_state=random_state).fit(self.sample)
+            return self.model
+
+        self.model = MiniBatchKMeans(n_clusters=self.n_clusters, batch_size=batch_size,
+                                     random_state=random_state)
+        # 先以子樣本初始化中心，再串流全部資料更新
+        self.model.partial_fit(self.sample)
+        for chunk in self._chunks(usecols=self.pc_cols):
+            values = chunk[self.pc_cols].dropna().to_numpy(dtype=float)
+            for start in range(0, len(values), batch_size):
+                self.model.partial_fit(values[start:start + batch_size])
+        return self.model
+
+    def profile(self):
+        """
+        逐批預測群別並累積各群的大小、PC 平均與人口變數交叉表
+
+        Returns:
+        --------
+        dict
+            'centers' 為各群 PC 平均，其餘鍵為各人口變數的列百分比表
+        """
+        k = self.n_clusters
+        counts = np.zeros(k)
+        sums = np.zeros((k, len(self.pc_cols)))
+        crosstabs = {col: None for col in self.group_cols}
+
+        for chunk in self._chunks():
+            chunk = chunk.dropna(subset=self.pc_cols)
+            values = chunk[self.pc_cols].to_numpy(dtype=float)
+            labels = self.model.predict(values)
+
+            counts += np.bincount(labels, minlength=k)
+            for j in range(len(self.pc_cols)):
+                sums[:, j] += np.bincount(labels, weights=values[:, j], minlength=k)
+
+            for col in self.group_cols:
+                if col not in chunk.columns:
+                    continue
+                table = pd.crosstab(labels, chunk[col].to_numpy())
+                crosstabs[col] = table if crosstabs[col] is None else crosstabs[col].add(table, fill_value=0)
+
+        centers = pd.DataFrame(sums / counts[:, None], columns=self.pc_cols)
+        centers.insert(0, '人數', counts.astype(int))
+        centers.index.name = 'cluster'
+        profiles = {'centers': centers}
+
+        print("\n各群主成分平均:")
+        print("=" * 50)
+        print(centers.round(3))
+
+        for col, table in crosstabs.items():
+            if table is None:
+                continue
+            table.index.name = 'cluster'
+            table.columns.name = col
+            pct = table.div(table.sum(axis=1), axis=0) * 100
+            profiles[col] = pct
+            print(f"\n各群 {col} 分布 (%):")
+            print(pct.round(1))
+
+        return profiles
+
+
+def build_score_file(data_path, output_path, store_dir=DEFAULT_STORE_DIR,
+                     group_cols=('gender_label', 'region', 'age_group')):
+    """由共用的主成分得分存放區取出 PC1-PC4 得分與人口變數，輸出為分群用的得分檔"""
+    pcs = [f'PC{i+1}' for i in range(4)]
+    store = open_or_build(data_path, store_dir, n_components=4)
+    pc_scores = store.frame(pcs)
+    pc_scores[pcs + [col for col in group_cols if col in pc_scores.columns]].to_csv(output_path, index=False)
+    return output_path
+
+
+def main():
+    score_path = build_score_file(
+        "/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv",
+        "pc_scores_with_groups.csv"
+    )
+
+    segmenter = PCSegmenter(score_path)
+    segmenter.draw_sample()
+    segmenter.choose_k(method='silhouette')
+    segmenter.fit()
+    profiles = segmenter.profile()
+
+    return segmenter, profiles
+
+if __name__ == "__main__":
+    segmenter, profiles = main()
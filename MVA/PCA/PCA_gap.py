@@ -0,0 +1,245 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+# 設置中文字型
+plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'Apple LiGothic Medium']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+def correlation_factor(Z):
+    """
+    將資料列標準化為單位長度，回傳相關矩陣的因子 Y (R = Y @ Y.T)
+
+    Parameters:
+    -----------
+    Z : ndarray, shape (n, p)
+        每一列為一個物件（題目或受訪者）的觀察向量
+
+    Returns:
+    --------
+    Y : ndarray, shape (n, p)
+        列向量已中心化並正規化，變異為 0 的列為全 0
+    valid : ndarray of bool
+        變異不為 0 的列
+    """
+    Y = Z - Z.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(Y, axis=1)
+    valid = norms > 1e-12
+    Y[valid] /= norms[valid, None]
+    Y[~valid] = 0.0
+    return Y, valid
+
+
+def _sqrtm_psd(S):
+    """半正定矩陣的平方根"""
+    eigvals, eigvecs = np.linalg.eigh(S)
+    eigvals = np.clip(eigvals, 0, None)
+    return (eigvecs * np.sqrt(eigvals)) @ eigvecs.T
+
+
+def iterate_correlations(Y, max_iter=100, rank_two_tol=1e-6):
+    """
+    以因子形式反覆計算相關矩陣的相關矩陣（GAP 的核心步驟）
+
+    R_k = Y_k @ Y_k.T 的第 j 行在中心化後為 Yc @ y_j，因此
+    R_{k+1} 的 (i, j) 元素正比於 y_i.T @ S @ y_j，其中 S = Yc.T @ Yc。
+    下一輪的因子即為 Y @ S^{1/2} 再做列正規化，全程只需 O(n p^2)，
+    不需要建立 n x n 矩陣，數千位受訪者也能處理。
+
+    當前兩個特徵值已解釋幾乎全部變異（秩二結構）時停止，此時各物件
+    在前兩個特徵向量上的投影會落在橢圓上。
+
+    Returns:
+    --------
+    Y : ndarray
+        收斂至秩二結構時的因子
+    n_iter : int
+        實際迭代次數
+    """
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        Yc = Y - Y.mean(axis=0, keepdims=True)
+        S = Yc.T @ Yc
+        Y_next = Y @ _sqrtm_psd(S)
+        norms = np.linalg.norm(Y_next, axis=1)
+        norms[norms < 1e-12] = 1.0
+        Y_next /= norms[:, None]
+
+        # 判斷是否已接近秩二
+        singular_values = np.linalg.svd(Y_next, compute_uv=False)
+        eigvals = singular_values ** 2
+        if eigvals.sum() <= 0:
+            break
+        Y = Y_next
+        if eigvals[:2].sum() / eigvals.sum() >= 1 - rank_two_tol:
+            break
+    return Y, n_iter
+
+
+def elliptical_order(Y):
+    """
+    依秩二結構的橢圓角度排序物件
+
+    將因子投影到前兩個奇異向量上，依 arctan2 角度排序，
+    並從相鄰角度差最大處切開，使排序由橢圓的一端開始。
+    """
+    U, s, _ = np.linalg.svd(Y, full_matrices=False)
+    coords = U[:, :2] * s[:2]
+    angles = np.arctan2(coords[:, 1], coords[:, 0])
+    order = np.argsort(angles)
+
+    sorted_angles = angles[order]
+    gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 2 * np.pi))
+    start = (np.argmax(gaps) + 1) % len(order)
+    return np.roll(order, -start)
+
+
+def gap_order(Z, max_iter=100, rank_two_tol=1e-6):
+    """
+    計算 GAP 的橢圓排序
+
+    Parameters:
+    -----------
+    Z : ndarray, shape (n, p)
+        要排序的物件（列）
+
+    Returns:
+    --------
+    order : ndarray
+        排序後的列索引，無變異的列放在最後
+    n_iter : int
+        相關矩陣迭代次數
+    """
+    Z = np.asarray(Z, dtype=float)
+    Y, valid = correlation_factor(Z.copy())
+    idx = np.flatnonzero(valid)
+    if len(idx) < 3:
+        return np.concatenate([idx, np.flatnonzero(~valid)]), 0
+
+    # 欄數多於列數時（例如題目 x 受訪者），先以 SVD 壓縮為 n x n 因子
+    Y = Y[idx]
+    if Y.shape[1] > Y.shape[0]:
+        U, s, _ = np.linalg.svd(Y, full_matrices=False)
+        Y = U * s
+
+    Y_conv, n_iter = iterate_correlations(Y, max_iter, rank_two_tol)
+    order = idx[elliptical_order(Y_conv)]
+    return np.concatenate([order, np.flatnonzero(~valid)]), n_iter
+
+
+def binned_rows(X, max_rows):
+    """以連續分箱平均將矩陣列數壓縮至 max_rows 以內（保留排序後的樣貌）"""
+    n = X.shape[0]
+    if n <= max_rows:
+        return X, np.arange(n)
+    starts = np.linspace(0, n, max_rows + 1).astype(int)[:-1]
+    sums = np.add.reduceat(X, starts, axis=0)
+    counts = np.diff(np.append(starts, n))
+    return sums / counts[:, None], starts
+
+
+class GAPAnalyzer:
+    def __init__(self, data_path):
+        """初始化 GAP 分析器"""
+        self.df = pd.read_csv(data_path)
+        self.X = None
+        self.attitude_cols = None
+        self.attitude_groups = None
+        self.item_corr = None
+        self.item_order = None
+        self.respondent_order = None
+
+    def prepare_data(self):
+        """準備數據"""
+        self.attitude_groups = {
+            'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],  # 觀察到的網路行為
+            'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],  # 個人網路行為
+            'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],    # 行為接受度
+            'influence': [f'q26_0{i}_1' for i in range(1, 4)]      # 影響評估
+        }
+
+        self.attitude_cols = [col for group in self.attitude_groups.values() for col in group]
+        self.X = self.df[self.attitude_cols].dropna()
+
+    def compute_item_order(self, max_iter=100):
+        """以題目相關矩陣計算題目的橢圓排序"""
+        X = self.X.to_numpy(dtype=float)
+        X_std = (X - X.mean(axis=0)) / X.std(axis=0)
+        self.item_corr = pd.DataFrame(
+            X_std.T @ X_std / len(X_std),
+            index=self.attitude_cols, columns=self.attitude_cols
+        )
+
+        # 題目的相關矩陣即為以題目為列的相關，直接交給 GAP 迭代
+        order, n_iter = gap_order(X_std.T, max_iter=max_iter)
+        self.item_order = [self.attitude_cols[i] for i in order]
+        print(f"題目排序完成（迭代 {n_iter} 次）")
+        return self.item_order
+
+    def compute_respondent_order(self, max_iter=100):
+        """以受訪者間的相關計算受訪者的橢圓排序"""
+        X = self.X.to_numpy(dtype=float)
+        X_std = (X - X.mean(axis=0)) / X.std(axis=0)
+
+        order, n_iter = gap_order(X_std, max_iter=max_iter)
+        self.respondent_order = self.X.index[order]
+        print(f"受訪者排序完成（迭代 {n_iter} 次，共 {len(order)} 位）")
+        return self.respondent_order
+
+    def plot_item_correlation(self):
+        """繪製 GAP 排序後的題目相關矩陣"""
+        ordered = self.item_corr.loc[self.item_order, self.item_order]
+
+        plt.figure(figsize=(12, 10))
+        sns.heatmap(ordered, cmap='coolwarm', center=0, vmin=-1, vmax=1,
+                    annot=True, fmt='.2f', annot_kws={'size': 7})
+        plt.title('GAP 排序後的題目相關矩陣', fontsize=12, pad=20)
+        plt.tight_layout()
+        plt.show()
+
+    def plot_data_matrix(self, max_rows=500):
+        """
+        繪製受訪者 x 題目的排序資料矩陣
+
+        受訪者數量超過 max_rows 時，依排序後的順序分箱取平均再繪製，
+        避免大樣本下產生數十萬格的熱力圖。
+        """
+        X = self.X.loc[self.respondent_order, self.item_order].to_numpy(dtype=float)
+        X_std = (X - X.mean(axis=0)) / X.std(axis=0)
+        binned, starts = binned_rows(X_std, max_rows)
+
+        plt.figure(figsize=(12, 10))
+        sns.heatmap(binned, cmap='coolwarm', center=0,
+                    xticklabels=self.item_order, yticklabels=False)
+        title = 'GAP 排序後的受訪者 x 題目資料矩陣'
+        if len(starts) < len(X_std):
+            title += f'（{len(X_std)} 位受訪者分為 {len(starts)} 組平均）'
+        plt.title(title, fontsize=12, pad=20)
+        plt.xlabel('題目', fontsize=10)
+        plt.ylabel('受訪者', fontsize=10)
+        plt.tight_layout()
+        plt.show()
+
+
+def main():
+    # 初始化分析器
+    analyzer = GAPAnalyzer("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv")
+
+    # 執行分析
+    analyzer.prepare_data()
+    analyzer.compute_item_order()
+    analyzer.compute_respondent_order()
+
+    print("\nGAP 題目排序:")
+    print(analyzer.item_order)
+
+    # 生成視覺化
+    analyzer.plot_item_correlation()
+    analyzer.plot_data_matrix()
+
+    return analyzer
+
+if __name__ == "__main__":
+    analyzer = main()
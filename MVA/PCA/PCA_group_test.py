@@ -0,0 +1,208 @@
+import pandas as pd
+import numpy as np
+from itertools import combinations
+from joblib import Parallel, delayed
+from scipy.stats import f as f_dist, chi2, norm, rankdata
+
+
+def _group_codes(pc_scores, grouping):
+    """
+    將單一或多個分組欄位轉為整數代碼（任一欄缺失時為 -1）
+
+    每欄各自 factorize，再以 ravel_multi_index 合併為交互作用代碼，
+    最後只保留實際出現的組合並重新編號。
+    """
+    cols = [grouping] if isinstance(grouping, str) else list(grouping)
+    factors = [pd.factorize(pc_scores[col], sort=True) for col in cols]
+    col_codes = np.stack([codes for codes, _ in factors])
+    dims = [len(levels) for _, levels in factors]
+
+    valid = (col_codes >= 0).all(axis=0)
+    observed, inverse = np.unique(np.ravel_multi_index(col_codes[:, valid], dims),
+                                  return_inverse=True)
+    codes = np.full(len(pc_scores), -1, dtype=np.int64)
+    codes[valid] = inverse
+
+    levels = [' × '.join(str(factor_levels[i]) for (_, factor_levels), i
+                         in zip(factors, np.unravel_index(key, dims)))
+              for key in observed]
+    return codes, levels
+
+
+def _group_sums(codes, values, n_groups):
+    """以 bincount 一次計算每組每欄的總和，values 為 (n, m)"""
+    return np.column_stack([
+        np.bincount(codes, weights=values[:, j], minlength=n_groups)
+        for j in range(values.shape[1])
+    ])
+
+
+def _permutation_batch(codes, values, counts, n_perm, seed):
+    """
+    一批排列檢定：回傳每次排列的 sum_g(S_g^2 / n_g)
+
+    組別人數在排列下不變，因此 ANOVA 的 F 與 Kruskal-Wallis 的 H
+    皆為此量的單調函數。將 n_perm 次排列攤平成 n_perm * G 個組，
+    每欄只需一次 bincount。
+    """
+    rng = np.random.default_rng(seed)
+    n = len(codes)
+    G = len(counts)
+    perm_codes = np.stack([codes[rng.permutation(n)] for _ in range(n_perm)])
+    flat = (np.arange(n_perm)[:, None] * G + perm_codes).ravel()
+
+    stats = np.empty((n_perm, values.shape[1]))
+    for j in range(values.shape[1]):
+        sums = np.bincount(flat, weights=np.tile(values[:, j], n_perm),
+                           minlength=n_perm * G).reshape(n_perm, G)
+        stats[:, j] = (sums ** 2 / counts).sum(axis=1)
+    return stats
+
+
+class GroupComparison:
+    def __init__(self, pc_scores, pc_cols=None, groupings=None):
+        """
+        初始化主成分得分的組間比較
+
+        Parameters:
+        -----------
+        pc_scores : DataFrame
+            包含 PC 分數與分組欄位的 DataFrame
+        pc_cols : list
+            要比較的主成分，預設 PC1-PC4
+        groupings : list
+            分組變數，字串為單一變數，tuple 為交互作用組合
+        """
+        self.pc_scores = pc_scores
+        self.pc_cols = pc_cols or [f'PC{i+1}' for i in range(4)]
+        self.groupings = groupings or [
+            'gender_label', 'region', 'age_group',
+            ('gender_label', 'region'), ('gender_label', 'age_group')
+        ]
+        self.results = None
+
+    def _compare(self, grouping, n_perm, n_jobs, max_elements, seed):
+        """對單一分組一次比較所有主成分"""
+        codes, levels = _group_codes(self.pc_scores, grouping)
+        valid = codes >= 0
+        codes = codes[valid]
+        X = self.pc_scores.loc[valid, self.pc_cols].to_numpy(dtype=float)
+        n, P = X.shape
+        G = len(levels)
+        name = grouping if isinstance(grouping, str) else ' × '.join(grouping)
+
+        # 整個得分矩陣一次轉為秩
+        R = rankdata(X, axis=0)
+        values = np.hstack([X, R])
+
+        counts = np.bincount(codes, minlength=G).astype(float)
+        sums = _group_sums(codes, values, G)
+        sumsq = _group_sums(codes, X ** 2, G)
+        means = sums / counts[:, None]
+
+        # ANOVA
+        total = X.sum(axis=0)
+        ss_total = (X ** 2).sum(axis=0) - total ** 2 / n
+        ss_between = (sums[:, :P] ** 2 / counts[:, None]).sum(axis=0) - total ** 2 / n
+        ss_within = ss_total - ss_between
+        df_b, df_w = G - 1, n - G
+        F = (ss_between / df_b) / (ss_within / df_w)
+        p_anova = f_dist.sf(F, df_b, df_w)
+        eta_sq = ss_between / ss_total
+
+        # Kruskal-Wallis（含同分校正）
+        tie_correction = np.array([
+            1 - (np.unique(R[:, j], return_counts=True)[1] ** 3 - 1).sum() / (n ** 3 - n)
+            for j in range(P)
+        ])
+        H = (12 / (n * (n + 1)) * (sums[:, P:] ** 2 / counts[:, None]).sum(axis=0)
+             - 3 * (n + 1)) / tie_correction
+        p_kw = chi2.sf(H, df_b)
+        epsilon_sq = H / (n - 1)
+
+        # 排列檢定，分批平行計算；每批排列數使 排列數 x n 不超過 max_elements
+        perm_p = np.full(2 * P, np.nan)
+        if n_perm > 0:
+            observed = (sums ** 2 / counts[:, None]).sum(axis=0)
+            batch_size = max(1, max_elements // n)
+            n_batches = max(1, int(np.ceil(n_perm / batch_size)))
+            batches = Parallel(n_jobs=n_jobs)(
+                delayed(_permutation_batch)(codes, values, counts,
+                                            min(batch_size, n_perm - b * batch_size), seed + b)
+                for b in range(n_batches)
+            )
+            perm_stats = np.vstack(batches)
+            perm_p = (1 + (perm_stats >= observed - 1e-12).sum(axis=0)) / (len(perm_stats) + 1)
+
+        rows = []
+        for j, pc in enumerate(self.pc_cols):
+            rows.append([pc, name, 'overall', 'ANOVA', F[j], df_b, p_anova[j],
+                         perm_p[j], eta_sq[j], 'eta_sq'])
+            rows.append([pc, name, 'overall', 'Kruskal-Wallis', H[j], df_b, p_kw[j],
+                         perm_p[P + j], epsilon_sq[j], 'epsilon_sq'])
+
+        # 兩兩比較：Hedges' g 與 Dunn z（以廣播一次計算所有組對）
+        var = (sumsq - counts[:, None] * means[:, :P] ** 2) / np.maximum(counts[:, None] - 1, 1)
+        a, b = np.array(list(combinations(range(G), 2))).reshape(-1, 2).T
+        if len(a):
+            na, nb = counts[a][:, None], counts[b][:, None]
+            pooled_sd = np.sqrt(((na - 1) * var[a] + (nb - 1) * var[b]) / (na + nb - 2))
+            hedges_g = (means[a, :P] - means[b, :P]) / pooled_sd * (1 - 3 / (4 * (na + nb) - 9))
+
+            dunn_se = np.sqrt(n * (n + 1) / 12 * tie_correction * (1 / na + 1 / nb))
+            dunn_z = (means[a, P:] - means[b, P:]) / dunn_se
+            dunn_p = np.minimum(2 * norm.sf(np.abs(dunn_z)) * len(a), 1.0)
+
+            for k in range(len(a)):
+                comparison = f'{levels[a[k]]} vs {levels[b[k]]}'
+                for j, pc in enumerate(self.pc_cols):
+                    rows.append([pc, name, comparison, 'Dunn', dunn_z[k, j], np.nan,
+                                 dunn_p[k, j], np.nan, hedges_g[k, j], 'hedges_g'])
+        return rows
+
+    def run(self, n_perm=999, n_jobs=-1, seed=0, max_elements=2 ** 22):
+        """
+        一次完成所有主成分 x 所有分組的檢定
+
+        排列檢定每批的排列數由 max_elements // n 決定（預設約 4M 個元素），
+        每個工作行程的記憶體用量與樣本數無關。
+
+        Returns:
+        --------
+        DataFrame
+            整齊格式的結果表，每列為一個 (主成分, 分組, 比較, 檢定)，
+            兩兩比較的 p 值已做 Bonferroni 校正
+        """
+        rows = []
+        for grouping in self.groupings:
+            rows.extend(self._compare(grouping, n_perm, n_jobs, max_elements, seed))
+
+        self.results = pd.DataFrame(rows, columns=[
+            'pc', 'grouping', 'comparison', 'test', 'statistic', 'df',
+            'p_value', 'perm_p_value', 'effect_size', 'effect_measure'
+        ])
+        return self.results
+
+    def summary(self, grouping, pc):
+        """回傳可標註於箱形圖的整體檢定摘要文字"""
+        overall = self.results[(self.results['grouping'] == grouping) &
+                               (self.results['pc'] == pc) &
+                               (self.results['comparison'] == 'overall')].set_index('test')
+        anova = overall.loc['ANOVA']
+        kw = overall.loc['Kruskal-Wallis']
+        return (f"F={anova['statistic']:.2f}, p={anova['p_value']:.3g}; "
+                f"H={kw['statistic']:.2f}, p={kw['p_value']:.3g}")
+
+    def print_summary(self):
+        """列印整體檢定結果"""
+        overall = self.results[self.results['comparison'] == 'overall']
+        print("\n主成分組間比較結果:")
+        print("=" * 50)
+        print(overall.drop(columns=['comparison']).round(4).to_string(index=False))
+
+        significant = self.results[(self.results['comparison'] != 'overall') &
+                                   (self.results['p_value'] < 0.05)]
+        print("\n顯著的兩兩比較 (Bonferroni p < 0.05):")
+        print("=" * 50)
+        print(significant[['pc', 'grouping', 'comparison', 'statistic',
+                           'p_value', 'effect_size']].round(4).to_string(index=False))
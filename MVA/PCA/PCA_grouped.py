@@ -0,0 +1,182 @@
+import pandas as pd
+import numpy as np
+from PCA_impute import respondent_frame
+from PCA_score_store import demographic_frame
+
+
+def tucker_congruence(A, B):
+    """逐欄計算 Tucker 一致性係數 (A 與 B 的形狀為 (..., p, k))"""
+    num = (A * B).sum(axis=-2)
+    den = np.sqrt((A ** 2).sum(axis=-2) * (B ** 2).sum(axis=-2))
+    return num / den
+
+
+class GroupedPCA:
+    def __init__(self, X, groups, n_components=4, chunksize=100000):
+        """
+        一次掃描資料完成各人口變數子群的 PCA
+
+        Parameters:
+        -----------
+        X : DataFrame
+            完整（無缺失）的題目資料
+        groups : DataFrame
+            與 X 同索引的分組欄位，例如 region、age_group、gender_label
+        n_components : int
+            比較的主成分數
+        chunksize : int
+            每批計算交叉乘積的列數
+        """
+        self.X = X
+        self.groups = groups.reindex(X.index)
+        self.n_components = n_components
+        self.chunksize = chunksize
+        self.levels = {}
+        self.stats = {}
+        self.pooled_loadings = None
+        self.group_loadings = {}
+        self.aligned_loadings = {}
+        self.results = None
+
+    def accumulate(self):
+        """
+        單次掃描累積每個子群的人數、總和與交叉乘積矩陣
+
+        所有分組的類別合併成一個 0/1 指標矩陣 H (n, G)，每批只需
+        H.T @ [1, x, x x.T] 三次矩陣乘法即得到所有子群的充分統計量。
+        """
+        X = self.X.to_numpy(dtype=float)
+        n, p = X.shape
+
+        codes, offsets = [], {}
+        total = 0
+        for col in self.groups.columns:
+            c, levels = pd.factorize(self.groups[col], sort=True)
+            self.levels[col] = list(levels)
+            offsets[col] = (total, total + len(levels))
+            codes.append(np.where(c >= 0, c + total, -1))
+            total += len(levels)
+        codes = np.stack(codes, axis=1) if codes else np.empty((n, 0), dtype=int)
+
+        count = np.zeros(total)
+        sums = np.zeros((total, p))
+        cross = np.zeros((total, p * p))
+        for start in range(0, n, self.chunksize):
+            block = X[start:start + self.chunksize]
+            c = codes[start:start + self.chunksize]
+            H = np.zeros((len(block), total))
+            rows, cols = np.nonzero(c >= 0)
+            H[rows, c[rows, cols]] = 1.0
+            outer = (block[:, :, None] * block[:, None, :]).reshape(len(block), p * p)
+            count += H.sum(axis=0)
+            sums += H.T @ block
+            cross += H.T @ outer
+
+        for col, (lo, hi) in offsets.items():
+            self.stats[col] = {'n': count[lo:hi], 'sum': sums[lo:hi], 'cross': cross[lo:hi]}
+
+        # 全體資料的充分統計量
+        self.stats['_pooled'] = {
+            'n': np.array([n]),
+            'sum': X.sum(axis=0)[None, :],
+            'cross': (X.T @ X).reshape(1, p * p),
+        }
+
+    @staticmethod
+    def _decompose(stats, n_components):
+        """由充分統計量批次計算相關矩陣並做特徵分解"""
+        count = stats['n']
+        p = stats['sum'].shape[1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = stats['sum'] / count[:, None]
+            cross = stats['cross'].reshape(-1, p, p)
+            cov = (cross - count[:, None, None] * mean[:, :, None] * mean[:, None, :]) / (count[:, None, None] - 1)
+            sd = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+            corr = cov / (sd[:, :, None] * sd[:, None, :])
+
+        # 人數不足或有零變異題目的子群不做分解
+        usable = (count > p) & np.isfinite(corr).all(axis=(1, 2))
+        eigvals = np.full((len(count), p), np.nan)
+        eigvecs = np.full((len(count), p, p), np.nan)
+        if usable.any():
+            vals, vecs = np.linalg.eigh(corr[usable])
+            eigvals[usable] = vals[:, ::-1]
+            eigvecs[usable] = vecs[:, :, ::-1]
+        return eigvals, eigvecs[:, :, :n_components]
+
+    def fit(self):
+        """分解各子群並計算與全體負荷量的一致性係數"""
+        if not self.stats:
+            self.accumulate()
+
+        k = self.n_components
+        pooled_vals, pooled_vecs = self._decompose(self.stats['_pooled'], k)
+        self.pooled_loadings = pd.DataFrame(
+            pooled_vecs[0], index=self.X.columns, columns=[f'PC{i+1}' for i in range(k)]
+        )
+
+        rows = []
+        for col in self.groups.columns:
+            eigvals, eigvecs = self._decompose(self.stats[col], k)
+
+            # 直接比較（只調整正負號）
+            phi_raw = np.abs(tucker_congruence(eigvecs, pooled_vecs))
+
+            # 特徵值相近時成分順序可能互換，另以批次正交 Procrustes 轉軸對齊後再比較
+            usable = np.isfinite(eigvecs).all(axis=(1, 2))
+            aligned = np.full_like(eigvecs, np.nan)
+            if usable.any():
+                M = np.swapaxes(eigvecs[usable], 1, 2) @ pooled_vecs
+                U, _, Vt = np.linalg.svd(M)
+                aligned[usable] = eigvecs[usable] @ (U @ Vt)
+            phi = tucker_congruence(aligned, pooled_vecs)
+
+            # group_loadings 為子群本身的 PCA 解（特徵值與變異量比例即對應於此），
+            # aligned_loadings 為轉軸對齊後的矩陣（congruence 以此計算）
+            pcs = [f'PC{i+1}' for i in range(k)]
+            for g, level in enumerate(self.levels[col]):
+                self.group_loadings[(col, level)] = pd.DataFrame(eigvecs[g], index=self.X.columns, columns=pcs)
+                self.aligned_loadings[(col, level)] = pd.DataFrame(aligned[g], index=self.X.columns, columns=pcs)
+                for i in range(k):
+                    rows.append([col, level, int(self.stats[col]['n'][g]), f'PC{i+1}',
+                                 eigvals[g, i], eigvals[g, i] / len(self.X.columns),
+                                 phi_raw[g, i], phi[g, i]])
+
+        self.results = pd.DataFrame(rows, columns=[
+            'grouping', 'group', 'n', 'pc', 'eigenvalue', 'variance_ratio',
+            'congruence_raw', 'congruence'
+        ])
+        return self.results
+
+    def print_summary(self):
+        """列印各子群與全體負荷量的一致性係數"""
+        table = self.results.pivot_table(index=['grouping', 'group'], columns='pc',
+                                         values='congruence', sort=False)
+        print("\n子群 PCA 與全體負荷量的 Tucker 一致性係數（Procrustes 對齊後）:")
+        print("=" * 50)
+        print(table.round(3))
+        print("\n（>= 0.95 視為相同成分，0.85-0.94 為相當相似）")
+        print("特徵值與變異量比例為各子群本身的解（group_loadings）；congruence 以")
+        print("Procrustes 對齊後的負荷量（aligned_loadings）計算，congruence_raw 為未轉軸的比較")
+
+
+def main():
+    df = pd.read_csv("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv")
+
+    attitude_groups = {
+        'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],
+        'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],
+        'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],
+        'influence': [f'q26_0{i}_1' for i in range(1, 4)]
+    }
+    attitude_cols = [col for group in attitude_groups.values() for col in group]
+
+    X = respondent_frame(df, attitude_cols).dropna()
+    grouped = GroupedPCA(X, demographic_frame(df))
+    grouped.fit()
+    grouped.print_summary()
+
+    return grouped
+
+if __name__ == "__main__":
+    grouped = main()
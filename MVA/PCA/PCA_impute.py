@@ -0,0 +1,180 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from PCA_weights import weighted_standardize, weighted_corr, effective_n
+
+
+def _impute_once(X, seed, max_iter=10):
+    """以鏈式迭代插補（抽樣自後驗分布）產生一份完整資料"""
+    # 延遲載入 scikit-learn，只匯入 respondent_frame 等輔助函式時不需付出載入成本
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+
+    imputer = IterativeImputer(sample_posterior=True, max_iter=max_iter,
+                               random_state=seed)
+    imputed = imputer.fit_transform(X)
+
+    # 插補值限制在觀察值範圍內
+    return np.clip(imputed, np.nanmin(X, axis=0), np.nanmax(X, axis=0))
+
+
+def _fit_imputation(X, seed, weights=None):
+    """插補一次並以相關矩陣做完整的特徵分解（供行程池呼叫）；給定權重時改用加權相關矩陣"""
+    imputed = _impute_once(X, seed)
+    if weights is None:
+        mean = imputed.mean(axis=0)
+        std = imputed.std(axis=0)
+        X_scaled = (imputed - mean) / std
+        corr = X_scaled.T @ X_scaled / len(X_scaled)
+    else:
+        X_scaled, _, _ = weighted_standardize(imputed, weights)
+        corr = weighted_corr(imputed, weights)
+    eigvals, eigvecs = np.linalg.eigh(corr)
+    order = np.argsort(eigvals)[::-1]
+    return {
+        'imputed': imputed,
+        'corr': corr,
+        'eigvals': eigvals[order],
+        'components': eigvecs[:, order],
+        'scores': X_scaled @ eigvecs[:, order],
+    }
+
+
+def run_imputations(X, n_imputations=20, n_jobs=None, seed=0, weights=None):
+    """
+    在行程池中平行產生 M 份插補資料並各自做特徵分解
+
+    Parameters:
+    -----------
+    X : ndarray, shape (n, p)
+        含缺失值的資料
+    n_imputations : int
+        插補份數 M
+    n_jobs : int
+        行程數，None 時使用全部 CPU
+    weights : ndarray
+        調查權重，None 時不加權
+    """
+    seeds = [seed + m for m in range(n_imputations)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(_fit_imputation, [X] * n_imputations, seeds,
+                                 [weights] * n_imputations))
+
+
+def pooled_correlation(results):
+    """以 Fisher z 轉換合併各插補資料的相關矩陣"""
+    z = np.mean([np.arctanh(np.clip(r['corr'], -0.999999, 0.999999)) for r in results], axis=0)
+    corr = np.tanh(z)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+class MultipleImputationPCA:
+    def __init__(self, X, n_imputations=20, n_jobs=None, seed=0, weights=None):
+        """
+        多重插補 PCA
+
+        保留所有受訪者，不做整列刪除。介面與 sklearn 的 PCA 相容
+        （components_、explained_variance_、explained_variance_ratio_、
+        n_components_），可直接替代既有的 PCA 物件。
+
+        Parameters:
+        -----------
+        X : DataFrame
+            含缺失值的題目資料，索引為受訪者 ID
+        n_imputations : int
+            插補份數 M
+        n_jobs : int
+            行程池大小
+        weights : Series
+            調查權重（與 X 同順序），None 時不加權
+        """
+        self.X = X
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        self.n_imputations = n_imputations
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.results = None
+        self.components_ = None
+        self.components_se_ = None
+        self.explained_variance_ = None
+        self.explained_variance_ratio_ = None
+        self.n_components_ = None
+        self.scores = None
+        self.corr = None
+
+    def impute(self):
+        """產生 M 份插補資料並合併相關矩陣"""
+        self.results = run_imputations(self.X.to_numpy(dtype=float), self.n_imputations,
+                                       self.n_jobs, self.seed, self.weights)
+        self.corr = pd.DataFrame(pooled_correlation(self.results),
+                                 index=self.X.columns, columns=self.X.columns)
+        return self.results
+
+    def pooled_eigenvalues(self):
+        """各插補資料特徵值的平均"""
+        return np.mean([r['eigvals'] for r in self.results], axis=0)
+
+    def fit(self, n_components):
+        """
+        對齊各插補的負荷量並以 Rubin 法則合併
+
+        以第一份插補為參考，其餘以正交 Procrustes 轉軸對齊；
+        插補內變異採 Anderson (1963) 的特徵向量漸近變異，
+        合併變異 T = W + (1 + 1/M) B。
+        """
+        from scipy.linalg import orthogonal_procrustes
+
+        if self.results is None:
+            self.impute()
+
+        n, p = self.X.shape
+        if self.weights is not None:
+            n = effective_n(self.weights)
+        M = len(self.results)
+        reference = self.results[0]['components'][:, :n_components]
+
+        loadings, within, scores = [], [], []
+        for r in self.results:
+            V = r['components'][:, :n_components]
+            R, _ = orthogonal_procrustes(V, reference)
+            loadings.append(V @ R)
+            scores.append(r['scores'][:, :n_components] @ R)
+
+            # 第 k 個特徵向量第 j 個元素的漸近變異
+            lam = r['eigvals']
+            diff = lam[None, :] - lam[:n_components, None]
+            with np.errstate(divide='ignore'):
+                weight = np.where(np.abs(diff) > 1e-12, lam[None, :] / diff ** 2, 0.0)
+            var = (r['components'] ** 2) @ weight.T * lam[:n_components] / n
+            within.append(var)
+
+        loadings = np.array(loadings)
+        pooled = loadings.mean(axis=0)
+        between = loadings.var(axis=0, ddof=1) if M > 1 else np.zeros_like(pooled)
+        total_var = np.mean(within, axis=0) + (1 + 1 / M) * between
+
+        eigvals = self.pooled_eigenvalues()
+        self.n_components_ = n_components
+        self.components_ = pooled.T
+        self.components_se_ = np.sqrt(total_var).T
+        self.explained_variance_ = eigvals[:n_components]
+        self.explained_variance_ratio_ = eigvals[:n_components] / eigvals.sum()
+        self.scores = pd.DataFrame(
+            np.mean(scores, axis=0),
+            index=self.X.index,
+            columns=[f'PC{i+1}' for i in range(n_components)]
+        )
+        return self
+
+    def fit_transform(self, n_components):
+        """合併後的主成分得分，以受訪者 ID 為索引"""
+        return self.fit(n_components).scores
+
+
+def respondent_frame(df, cols, id_col='id'):
+    """取出題目欄位並以受訪者 ID 為索引（沒有 ID 欄位時沿用原索引）"""
+    X = df[cols]
+    if id_col in df.columns:
+        X = X.set_index(df[id_col])
+    return X
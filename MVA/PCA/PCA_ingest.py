@@ -0,0 +1,179 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PCA_weights import WEIGHT_COL
+
+# 共同編碼簿：q1 性別（1 男、2 女）、q3 縣市（1-24）、q7 每日上網時間（1-3）
+GENDER_LABELS = {1: '男性', 2: '女性'}
+USAGE_LABELS = {1: '0-3h', 2: '3-6h', 3: '6h+'}
+REGIONS = ['北部', '中部', '南部', '東部', '其他']
+COUNTY_REGION = {
+    1: '北部', 2: '北部', 3: '北部', 4: '北部', 5: '北部',  # 基隆、台北、新北、桃園、新竹縣
+    6: '北部',  # 新竹市
+    7: '中部', 8: '中部', 9: '中部', 10: '中部',  # 苗栗、南投、台中、彰化
+    11: '中部', 12: '中部', 13: '中部',  # 雲林、嘉義縣、嘉義市
+    14: '南部', 15: '南部', 16: '南部',  # 台南、高雄、屏東
+    17: '東部', 18: '東部', 19: '東部',  # 宜蘭、花蓮、台東
+    20: '其他', 21: '其他', 22: '其他', 23: '其他', 24: '其他'  # 澎湖、金門、連江、外島
+}
+
+# 各欄位的解碼方式：欄位 -> (輸出欄位名稱, 代碼對應標籤, 類別順序)
+CODEBOOK = {
+    'q1': ('gender_label', GENDER_LABELS, list(GENDER_LABELS.values())),
+    'q3': ('region', COUNTY_REGION, REGIONS),
+    'q7': ('internet_usage', USAGE_LABELS, list(USAGE_LABELS.values())),
+}
+
+# 精簡匯出檔（final_report 讀取）：q1 為 0 女 / 1 男，q3 為 1-6 的地區代碼
+# （離島與其他分開），標籤沿用報表的英文
+EXPORT_GENDER_LABELS = {0: 'female', 1: 'man'}
+EXPORT_AREA_LABELS = {1: 'North', 2: 'Central', 3: 'South', 4: 'East', 5: 'Islands', 6: 'Others'}
+EXPORT_USAGE_LABELS = {1: '0-3 hrs', 2: '3-6 hrs', 3: 'over 6 hrs'}
+EXPORT_CODEBOOK = {
+    'q1': ('Gender', EXPORT_GENDER_LABELS, list(EXPORT_GENDER_LABELS.values())),
+    'q3': ('Area', EXPORT_AREA_LABELS, list(EXPORT_AREA_LABELS.values())),
+    'q7': ('Net_Time', EXPORT_USAGE_LABELS, list(EXPORT_USAGE_LABELS.values())),
+}
+
+
+def canonical_schema():
+    """共同編碼簿的欄位與型別（題目與人口變數以 float32 保留缺失值）"""
+    attitude_groups = {
+        'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],
+        'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],
+        'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],
+        'influence': [f'q26_0{i}_1' for i in range(1, 4)]
+    }
+    schema = {'id': 'Int64'}
+    schema.update({col: 'float32' for group in attitude_groups.values() for col in group})
+    schema.update({'q1': 'float32', 'q2': 'float32', 'q3': 'float32', 'q7': 'float32',
+                   'weight': 'float64'})
+    return schema
+
+
+def load_codebook(rename_path=None, recode_path=None):
+    """
+    讀取宣告式的編碼簿
+
+    rename 表欄位：wave, source, target（wave 為 * 時套用至所有波次）
+    recode 表欄位：wave, column, source_value, target_value（column 為共同欄位名稱）
+    """
+    rename = pd.read_csv(rename_path, dtype=str) if rename_path else None
+    recode = pd.read_csv(recode_path) if recode_path else None
+    return rename, recode
+
+
+def _wave_rules(wave_id, rename, recode):
+    """取出某一波次適用的更名與重新編碼規則（波次專屬規則優先於 *）"""
+    renames, recodes = {}, {}
+    if rename is not None:
+        for scope in ['*', str(wave_id)]:
+            rows = rename[rename['wave'].astype(str) == scope]
+            renames.update(zip(rows['source'], rows['target']))
+    if recode is not None:
+        for scope in ['*', str(wave_id)]:
+            rows = recode[recode['wave'].astype(str) == scope]
+            for col, rows_col in rows.groupby('column'):
+                recodes.setdefault(col, {}).update(zip(rows_col['source_value'], rows_col['target_value']))
+    return renames, recodes
+
+
+def _recode(values, mapping):
+    """以排序後的查表一次完成重新編碼，不在對照表中的值保持不變"""
+    source = np.array(sorted(mapping), dtype=float)
+    target = np.array([mapping[k] for k in sorted(mapping)], dtype=float)
+    values = np.asarray(values, dtype=float)
+    pos = np.clip(np.searchsorted(source, values), 0, len(source) - 1)
+    hit = source[pos] == values
+    return np.where(hit, target[pos], values)
+
+
+def decode_demographics(df, codebook=CODEBOOK):
+    """
+    依編碼簿將 q1、q3、q7 解碼為類別型的標籤欄位（缺少的欄位略過）
+
+    預設為共同編碼簿（gender_label、region、internet_usage）；
+    精簡匯出檔請用 EXPORT_CODEBOOK（Gender、Area、Net_Time）。
+    """
+    decoded = {}
+    for col, (name, labels, categories) in codebook.items():
+        if col in df.columns:
+            decoded[name] = pd.Categorical(df[col].map(labels), categories=categories)
+    return pd.DataFrame(decoded, index=df.index)
+
+
+def read_wave(path, wave_id, rename=None, recode=None, schema=None):
+    """
+    讀取單一波次並轉換為共同編碼簿的欄位名稱與代碼
+
+    只讀入編碼簿需要的欄位，讀取時直接解析為 schema 的型別；
+    缺少的欄位由 ingest_waves 補為缺失值（權重補為 1）。
+    """
+    schema = schema or canonical_schema()
+    renames, recodes = _wave_rules(wave_id, rename, recode)
+    target = {source: renames.get(source, source) for source in set(schema) | set(renames)}
+    target = {source: col for source, col in target.items() if col in schema}
+    dtypes = {source: 'float64' if col in recodes else schema[col] for source, col in target.items()}
+
+    df = pd.read_csv(path, usecols=lambda c: c in target, dtype=dtypes)
+    df = df.rename(columns=renames)
+    for col, mapping in recodes.items():
+        if col in df.columns:
+            df[col] = _recode(df[col], mapping)
+
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        print(f"波次 {wave_id} 缺少欄位: {', '.join(missing)}")
+    return df
+
+
+def ingest_waves(waves, rename=None, recode=None, schema=None, max_workers=None):
+    """
+    以執行緒池同時讀取多個波次，合併為單一具型別的資料表
+
+    各波次讀完後直接寫入預先配置好的欄位陣列（每欄只複製一次，
+    不經過 pd.concat 的中間合併），wave 欄位為類別型，類別順序與
+    waves 相同。讀檔在執行緒中進行（pandas 的 C 解析器會釋放 GIL），
+    總耗時約等於最慢的單一檔案。
+
+    Parameters:
+    -----------
+    waves : dict
+        波次 ID 對應檔案路徑
+    rename, recode : DataFrame
+        宣告式編碼簿（見 load_codebook）
+    schema : dict
+        共同欄位與型別，預設為 canonical_schema()
+
+    Returns:
+    --------
+    DataFrame
+        所有波次的資料，含 wave 欄位
+    """
+    schema = schema or canonical_schema()
+    wave_ids = list(waves)
+    with ThreadPoolExecutor(max_workers=max_workers or len(wave_ids)) as executor:
+        frames = list(executor.map(
+            lambda w: read_wave(waves[w], w, rename, recode, schema), wave_ids
+        ))
+
+    lengths = np.array([len(f) for f in frames])
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    total = int(bounds[-1])
+
+    columns = {}
+    for col, dtype in schema.items():
+        dtype = pd.api.types.pandas_dtype(dtype)
+        # 可為缺失的整數型別先填入 float64，最後再一次轉換
+        extension = isinstance(dtype, pd.api.extensions.ExtensionDtype)
+        buffer = np.empty(total, dtype=np.float64 if extension else dtype)
+        for f, start, stop in zip(frames, bounds[:-1], bounds[1:]):
+            if col in f.columns:
+                buffer[start:stop] = f[col].to_numpy(dtype=buffer.dtype, na_value=np.nan)
+            else:
+                buffer[start:stop] = 1.0 if col == WEIGHT_COL else np.nan
+        columns[col] = pd.array(buffer, dtype=dtype) if extension else buffer
+
+    codes = np.repeat(np.arange(len(wave_ids), dtype=np.int8), lengths)
+    columns['wave'] = pd.Categorical.from_codes(codes, categories=[str(w) for w in wave_ids])
+    return pd.DataFrame(columns)
@@ -5,15 +5,21 @@ from sklearn.decomposition import PCA
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.patches import Circle
+from PCA_impute import MultipleImputationPCA, respondent_frame
+from PCA_robust import RobustPCA
+from PCA_weights import respondent_weights, is_uniform, weighted_standardize, nan_standardize, WeightedPCA
+from PCA_polychoric import polychoric_correlation, CorrelationPCA
 
 # 設置中文字型
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'Apple LiGothic Medium']
 plt.rcParams['axes.unicode_minus'] = False
 
 class PCAAnalyzer:
-    def __init__(self, data_path):
-        """初始化 PCA 分析器"""
-        self.df = pd.read_csv(data_path)
+    def __init__(self, data_path, weight_col='weight'):
+        """初始化 PCA 分析器（data_path 也可以直接傳入 DataFrame）；資料含權重欄位時預設加權"""
+        self.df = data_path if isinstance(data_path, pd.DataFrame) else pd.read_csv(data_path)
+        self.weight_col = weight_col
+        self.weights = None
         self.X = None
         self.attitude_cols = None
         self.attitude_groups = None
@@ -21,9 +27,10 @@ class PCAAnalyzer:
         self.X_pca = None
         self.X_scaled = None
         self.loadings = None
+        self.outliers = None
         
-    def prepare_data(self):
-        """準備數據"""
+    def prepare_data(self, impute=False):
+        """準備數據；impute=True 時保留有缺失值的受訪者，改由多重插補處理"""
         self.attitude_groups = {
             'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],  # 觀察到的網路行為
             'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],  # 個人網路行為
@@ -32,29 +39,125 @@ class PCAAnalyzer:
         }
         
         self.attitude_cols = [col for group in self.attitude_groups.values() for col in group]
-        self.X = self.df[self.attitude_cols].dropna()
-        
-    def do_pca(self):
-        """執行 PCA 分析"""
-        scaler = StandardScaler()
-        self.X_scaled = scaler.fit_transform(self.X)
+        self.X = respondent_frame(self.df, self.attitude_cols)
+        self.weights = respondent_weights(self.df, self.weight_col)
+        if not impute:
+            complete = self.X.notna().all(axis=1).to_numpy()
+            self.X = self.X[complete]
+            self.weights = self.weights[complete]
+        
+    def do_pca(self, n_imputations=20, n_components=None, robust=False, robust_method='mcd',
+               correlation='pearson'):
+        """
+        執行 PCA 分析；指定 n_components 時不做主成分數選擇，robust=True 時改用穩健 PCA
+
+        correlation 為 'polychoric' 或相關矩陣 DataFrame 時，改由該矩陣分解
+        """
+        if robust:
+            return self.do_robust_pca(n_components, robust_method)
+        if isinstance(correlation, pd.DataFrame) or correlation != 'pearson':
+            return self.do_corr_pca(correlation, n_components)
+        if self.X.isna().any().any():
+            return self.do_mi_pca(n_imputations, n_components)
+        
+        weighted = not is_uniform(self.weights)
+        if weighted:
+            self.X_scaled, _, _ = weighted_standardize(self.X, self.weights)
+        else:
+            scaler = StandardScaler()
+            self.X_scaled = scaler.fit_transform(self.X)
         
         # 計算最佳主成分數
-        pca_full = PCA()
-        X_pca_full = pca_full.fit_transform(self.X_scaled)
+        if n_components is None:
+            if weighted:
+                pca_full = WeightedPCA().fit(self.X_scaled, self.weights)
+            else:
+                pca_full = PCA().fit(self.X_scaled)
+            
+            # 使用 Kaiser 準則和解釋變異量比例確定主成分數
+            n_components = sum(pca_full.explained_variance_ > 1)
+            var_ratio_cum = np.cumsum(pca_full.explained_variance_ratio_)
+            n_components_var = np.argmax(var_ratio_cum > 0.8) + 1
+            
+            # 選擇較小的數量
+            n_components = min(n_components, n_components_var)
         
-        # 使用 Kaiser 準則和解釋變異量比例確定主成分數
-        n_components = sum(pca_full.explained_variance_ > 1)
-        var_ratio_cum = np.cumsum(pca_full.explained_variance_ratio_)
-        n_components_var = np.argmax(var_ratio_cum > 0.8) + 1
+        if weighted:
+            self.pca = WeightedPCA(n_components=n_components)
+            self.X_pca = self.pca.fit_transform(self.X_scaled, self.weights)
+        else:
+            self.pca = PCA(n_components=n_components)
+            self.X_pca = self.pca.fit_transform(self.X_scaled)
+        
+        # 計算 loadings
+        self.loadings = pd.DataFrame(
+            self.pca.components_.T,
+            columns=[f'PC{i+1}' for i in range(self.pca.n_components_)],
+            index=self.attitude_cols
+        )
         
-        # 選擇較小的數量
-        n_components = min(n_components, n_components_var)
+    def do_mi_pca(self, n_imputations=20, n_components=None):
+        """以多重插補 PCA 取代整列刪除，主成分數的選擇準則與 do_pca 相同"""
+        weights = None if is_uniform(self.weights) else self.weights
+        mi_pca = MultipleImputationPCA(self.X, n_imputations=n_imputations, weights=weights)
+        mi_pca.impute()
         
-        self.pca = PCA(n_components=n_components)
-        self.X_pca = self.pca.fit_transform(self.X_scaled)
+        if n_components is None:
+            eigvals = mi_pca.pooled_eigenvalues()
+            n_components = sum(eigvals > 1)
+            n_components_var = np.argmax(np.cumsum(eigvals / eigvals.sum()) > 0.8) + 1
+            n_components = min(n_components, n_components_var)
         
-        # 計算 loadings
+        self.pca = mi_pca.fit(n_components)
+        self.X_pca = self.pca.scores
+        self.loadings = pd.DataFrame(
+            self.pca.components_.T,
+            columns=[f'PC{i+1}' for i in range(self.pca.n_components_)],
+            index=self.attitude_cols
+        )
+        
+    def do_corr_pca(self, correlation='polychoric', n_components=None):
+        """
+        由給定的相關矩陣（預設為多分格相關）做 PCA，主成分數的選擇準則與 do_pca 相同
+
+        得分以（加權）標準化後的題目乘上負荷量，缺失值以平均代入
+        """
+        if isinstance(correlation, pd.DataFrame):
+            corr = correlation.loc[self.attitude_cols, self.attitude_cols]
+        else:
+            corr = polychoric_correlation(self.X, self.weights)
+        
+        pca_full = CorrelationPCA().fit(corr)
+        if n_components is None:
+            eigvals = pca_full.eigenvalues_
+            n_components = sum(eigvals > 1)
+            n_components_var = np.argmax(np.cumsum(eigvals / eigvals.sum()) > 0.8) + 1
+            n_components = min(n_components, n_components_var)
+        
+        self.pca = CorrelationPCA(n_components=n_components).fit(corr)
+        self.X_scaled = nan_standardize(self.X, self.weights)
+        self.X_pca = self.pca.transform(self.X_scaled)
+        self.loadings = pd.DataFrame(
+            self.pca.components_.T,
+            columns=[f'PC{i+1}' for i in range(self.pca.n_components_)],
+            index=self.attitude_cols
+        )
+        
+    def do_robust_pca(self, n_components=None, method='mcd'):
+        """
+        穩健 PCA：先排除直線作答者，再以 FastMCD 或空間符號共變異數估計主成分
+
+        離群與直線作答的標記存於 self.outliers（以受訪者 ID 為索引）
+        """
+        if self.X.isna().any().any():
+            raise ValueError("穩健 PCA 需要完整資料，請以 prepare_data(impute=False) 準備資料")
+
+        self.pca = RobustPCA(n_components=n_components, method=method,
+                             blocks=self.attitude_groups)
+        self.pca.fit(self.X)
+        self.pca.print_summary()
+        self.X_pca = self.pca.scores
+        self.outliers = self.pca.flags
         self.loadings = pd.DataFrame(
             self.pca.components_.T,
             columns=[f'PC{i+1}' for i in range(self.pca.n_components_)],
@@ -136,7 +239,7 @@ def main():
     analyzer = PCAAnalyzer("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv")
     
     # 執行分析
-    analyzer.prepare_data()
+    analyzer.prepare_data(impute=True)
     analyzer.do_pca()
     
     # 生成視覺化
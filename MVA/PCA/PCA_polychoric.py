@@ -0,0 +1,285 @@
+import os
+import hashlib
+import pandas as pd
+import numpy as np
+
+# 以資料雜湊值為鍵的相關矩陣快取（同一行程內重複呼叫時直接取用）
+_CACHE = {}
+
+# 跨行程的快取檔目錄，位於預設主成分得分存放區旁（MVA/polychoric_cache）
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'polychoric_cache')
+
+# 門檻值的有限替代值：Phi(8) 與 1 的差距低於浮點精度
+_INF = 8.0
+
+_NODES, _WEIGHTS = np.polynomial.legendre.leggauss(20)
+
+
+def _norm_cdf(x):
+    from scipy.special import ndtr
+    return ndtr(x)
+
+
+def _norm_ppf(p):
+    from scipy.special import ndtri
+    return ndtri(p)
+
+
+def bivariate_normal_cdf(h, k, rho):
+    """
+    標準二元常態分配函數 Phi2(h, k; rho)，對任意形狀的陣列向量化
+
+    Phi2 = Phi(h) Phi(k) + 1/(2 pi) * integral_0^asin(rho)
+           exp(-(h^2 - 2 h k sin t + k^2) / (2 cos^2 t)) dt
+    積分以 20 點 Gauss-Legendre 計算；換成角度後被積函數在 |rho| -> 1
+    時仍有界，高相關時依然準確。
+    """
+    h, k, rho = np.broadcast_arrays(h, k, rho)
+    theta = np.arcsin(rho)[..., None] * (_NODES + 1) / 2
+    s, c2 = np.sin(theta), np.cos(theta) ** 2
+    hh, kk = h[..., None], k[..., None]
+    integrand = np.exp(-(hh ** 2 - 2 * hh * kk * s + kk ** 2) / (2 * c2))
+    integral = (integrand * _WEIGHTS).sum(axis=-1) * np.arcsin(rho) / 2
+    return _norm_cdf(h) * _norm_cdf(k) + integral / (2 * np.pi)
+
+
+def ordinal_codes(X):
+    """
+    將每題的作答轉為 0..K-1 的類別代碼（缺失為 -1）
+
+    Returns:
+    --------
+    codes : ndarray, shape (n, p)
+    n_categories : ndarray, shape (p,)
+    """
+    values = X.to_numpy(dtype=float)
+    codes = np.full(values.shape, -1, dtype=np.int64)
+    n_categories = np.zeros(values.shape[1], dtype=int)
+    for j in range(values.shape[1]):
+        observed = ~np.isnan(values[:, j])
+        levels, codes[observed, j] = np.unique(values[observed, j], return_inverse=True)
+        n_categories[j] = len(levels)
+    return codes, n_categories
+
+
+def estimate_thresholds(codes, n_categories, weights):
+    """
+    每題只估計一次門檻值（累積比例的常態分位數）
+
+    Returns:
+    --------
+    ndarray, shape (p, K + 1)
+        兩端為 -/+_INF，類別數少於 K 的題目以 _INF 補齊
+    """
+    n, p = codes.shape
+    K = n_categories.max()
+    thresholds = np.full((p, K + 1), _INF)
+    thresholds[:, 0] = -_INF
+    for j in range(p):
+        observed = codes[:, j] >= 0
+        counts = np.bincount(codes[observed, j], weights=weights[observed], minlength=K)
+        cum = np.cumsum(counts)[:n_categories[j] - 1] / counts.sum()
+        thresholds[j, 1:n_categories[j]] = np.clip(_norm_ppf(cum), -_INF, _INF)
+    return thresholds
+
+
+def pair_tables(codes, weights, pairs, K, chunksize=100000):
+    """
+    所有題目組合的（加權）列聯表，以一次 bincount 計算，形狀 (P, K, K)
+
+    每一對題目只計入兩題都有作答的受訪者（成對刪除）。
+    """
+    P = len(pairs)
+    tables = np.zeros(P * K * K)
+    offset = (np.arange(P) * K * K)[:, None]
+    for start in range(0, len(codes), chunksize):
+        a = codes[start:start + chunksize, pairs[:, 0]].T
+        b = codes[start:start + chunksize, pairs[:, 1]].T
+        w = np.broadcast_to(weights[start:start + chunksize], a.shape)
+        valid = (a >= 0) & (b >= 0)
+        cell = offset + a * K + b
+        tables += np.bincount(cell[valid], weights=w[valid], minlength=P * K * K)
+    return tables.reshape(P, K, K)
+
+
+def _log_likelihood(rho, tables, lower_a, upper_a, lower_b, upper_b):
+    """所有組合在各自 rho 下的多項式對數概似，形狀 (P,)"""
+    r = rho[:, None, None]
+    prob = (bivariate_normal_cdf(upper_a, upper_b, r) - bivariate_normal_cdf(lower_a, upper_b, r)
+            - bivariate_normal_cdf(upper_a, lower_b, r) + bivariate_normal_cdf(lower_a, lower_b, r))
+    return (tables * np.log(np.maximum(prob, 1e-300))).sum(axis=(1, 2))
+
+
+def _fit_pairs(tables, ta, tb, n_iter=60):
+    """
+    對一批題目組合同時以黃金分割搜尋最大化概似（在 atanh(rho) 尺度上）
+
+    門檻值固定為各題的邊際估計（兩階段估計法，Olsson 1979）。
+    """
+    lower_a, upper_a = ta[:, :-1, None], ta[:, 1:, None]
+    lower_b, upper_b = tb[:, None, :-1], tb[:, None, 1:]
+
+    def f(z):
+        return _log_likelihood(np.tanh(z), tables, lower_a, upper_a, lower_b, upper_b)
+
+    golden = (np.sqrt(5) - 1) / 2
+    lo = np.full(len(tables), -3.8)
+    hi = np.full(len(tables), 3.8)
+    x1 = hi - golden * (hi - lo)
+    x2 = lo + golden * (hi - lo)
+    f1, f2 = f(x1), f(x2)
+    for _ in range(n_iter):
+        right = f1 < f2
+        lo = np.where(right, x1, lo)
+        hi = np.where(right, hi, x2)
+        x1_new = np.where(right, x2, hi - golden * (hi - lo))
+        x2_new = np.where(right, lo + golden * (hi - lo), x1)
+        f_new = f(np.where(right, x2_new, x1_new))
+        f1, f2 = np.where(right, f2, f_new), np.where(right, f_new, f1)
+        x1, x2 = x1_new, x2_new
+    return np.tanh((lo + hi) / 2)
+
+
+def nearest_positive_definite(R, eps=1e-6, n_iter=100):
+    """
+    修正為正定相關矩陣
+
+    交替將特徵值截斷在 eps 以上並把對角線設回 1（Higham 交替投影，
+    含 Dykstra 修正），已為正定時直接回傳。迭代結束後若仍未正定，
+    最後再截斷一次特徵值並重新縮放為單位對角線，保證結果可做
+    Cholesky 分解。
+    """
+    R = np.asarray(R, dtype=float)
+    if np.linalg.eigvalsh(R).min() > eps:
+        return R
+
+    Y = R.copy()
+    correction = np.zeros_like(R)
+    for _ in range(n_iter):
+        S = Y - correction
+        vals, vecs = np.linalg.eigh(S)
+        X = (vecs * np.maximum(vals, eps)) @ vecs.T
+        correction = X - S
+        Y = X.copy()
+        np.fill_diagonal(Y, 1.0)
+        if np.linalg.eigvalsh(Y).min() > eps / 2:
+            break
+
+    Y = (Y + Y.T) / 2
+    vals, vecs = np.linalg.eigh(Y)
+    if vals.min() <= eps / 2:
+        # 特徵值下限：截斷後以 D^-1/2 Y D^-1/2 縮放回單位對角線（合同變換保持正定）
+        Y = (vecs * np.maximum(vals, eps)) @ vecs.T
+        d = np.sqrt(np.diag(Y))
+        Y = Y / np.outer(d, d)
+        Y = (Y + Y.T) / 2
+        np.fill_diagonal(Y, 1.0)
+    return Y
+
+
+def data_hash(codes, weights, columns):
+    """以類別代碼、權重與欄位順序計算快取鍵"""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(codes).tobytes())
+    h.update(np.ascontiguousarray(weights, dtype=np.float64).tobytes())
+    h.update('|'.join(map(str, columns)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def polychoric_correlation(X, weights=None, n_jobs=1, batch_size=500, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    多分格（polychoric）相關矩陣；二元題目即為四分（tetrachoric）相關
+
+    門檻值每題只估計一次；所有題目組合的列聯表以一次 bincount 建立，
+    再以向量化的二元常態概似同時估計所有組合（n_jobs > 1 時再分批
+    交給多個行程）。結果經正定修正，並以資料雜湊值快取。
+
+    Parameters:
+    -----------
+    X : DataFrame
+        有序類別題目（可含缺失值，成對刪除）
+    weights : array-like
+        調查權重，None 時不加權
+    cache_dir : str
+        另存快取檔的目錄，預設為 DEFAULT_CACHE_DIR；None 時只在記憶體中快取
+
+    Returns:
+    --------
+    DataFrame
+        正定的相關矩陣
+    """
+    from joblib import Parallel, delayed
+
+    codes, n_categories = ordinal_codes(X)
+    w = np.ones(len(X)) if weights is None else np.asarray(weights, dtype=float)
+    key = data_hash(codes, w, X.columns)
+
+    if key in _CACHE:
+        return _CACHE[key].copy()
+    cache_file = os.path.join(cache_dir, f'polychoric_{key}.npy') if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
+        corr = pd.DataFrame(np.load(cache_file), index=X.columns, columns=X.columns)
+        _CACHE[key] = corr
+        return corr.copy()
+
+    p = X.shape[1]
+    K = n_categories.max()
+    thresholds = estimate_thresholds(codes, n_categories, w)
+    pairs = np.array([(i, j) for i in range(p) for j in range(i + 1, p)])
+    tables = pair_tables(codes, w, pairs, K)
+
+    batches = [slice(s, s + batch_size) for s in range(0, len(pairs), batch_size)]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_pairs)(tables[b], thresholds[pairs[b, 0]], thresholds[pairs[b, 1]])
+        for b in batches
+    )
+    rho = np.concatenate(results)
+
+    R = np.eye(p)
+    R[pairs[:, 0], pairs[:, 1]] = rho
+    R[pairs[:, 1], pairs[:, 0]] = rho
+    R = nearest_positive_definite(R)
+
+    corr = pd.DataFrame(R, index=X.columns, columns=X.columns)
+    _CACHE[key] = corr
+    if cache_file:
+        # 先寫入暫存檔再改名，同時執行的其他行程不會讀到寫到一半的檔案
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp.npy'
+        np.save(tmp_file, R)
+        os.replace(tmp_file, cache_file)
+    return corr.copy()
+
+
+class CorrelationPCA:
+    def __init__(self, n_components=None):
+        """
+        由給定的相關矩陣（例如多分格相關）做主成分分解
+
+        介面與 sklearn 的 PCA 相容（components_、explained_variance_、
+        explained_variance_ratio_、n_components_、transform）。
+        """
+        self.n_components = n_components
+        self.components_ = None
+        self.explained_variance_ = None
+        self.explained_variance_ratio_ = None
+        self.n_components_ = None
+        self.eigenvalues_ = None
+
+    def fit(self, corr):
+        eigvals, eigvecs = np.linalg.eigh(np.asarray(corr, dtype=float))
+        order = np.argsort(eigvals)[::-1]
+        eigvals, eigvecs = eigvals[order], eigvecs[:, order]
+
+        k = self.n_components or len(eigvals)
+        self.eigenvalues_ = eigvals
+        self.n_components_ = k
+        self.components_ = eigvecs[:, :k].T
+        self.explained_variance_ = eigvals[:k]
+        self.explained_variance_ratio_ = eigvals[:k] / eigvals.sum()
+        return self
+
+    def transform(self, X_scaled):
+        """標準化後的資料投影至主成分（缺失值以平均，即 0 代入，見 nan_standardize）"""
+        return np.nan_to_num(np.asarray(X_scaled, dtype=float)) @ self.components_.T
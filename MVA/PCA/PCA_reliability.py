@@ -0,0 +1,242 @@
+import pandas as pd
+import numpy as np
+from PCA_impute import respondent_frame
+from PCA_score_store import demographic_frame
+from PCA_weights import respondent_weights
+
+
+def _batched_covariances(X, weight_block, M, chunksize=20000):
+    """
+    M 組權重下的共變異數矩陣，形狀 (M, p, p)
+
+    全樣本、各子群（0/1 指標）與 bootstrap 複本（Poisson 次數）都只是
+    不同的權重列，因此一次矩陣乘法 W @ [x x.T] 就能得到所有交叉乘積。
+    weight_block(start, stop) 回傳該批列的權重 (M, stop - start)，
+    記憶體只與 M x chunksize 有關。
+    """
+    n, p = X.shape
+    count = np.zeros(M)
+    sums = np.zeros((M, p))
+    cross = np.zeros((M, p * p))
+    for start in range(0, n, chunksize):
+        block = X[start:start + chunksize]
+        w = weight_block(start, start + len(block))
+        count += w.sum(axis=1)
+        sums += w @ block
+        cross += w @ (block[:, :, None] * block[:, None, :]).reshape(len(block), p * p)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / count[:, None]
+        cov = (cross.reshape(M, p, p) - count[:, None, None] * mean[:, :, None] * mean[:, None, :]) \
+            / (count[:, None, None] - 1)
+    return count, cov
+
+
+def scale_statistics(C):
+    """
+    由量表題目的共變異數矩陣（可批次，形狀 (..., k, k)）計算信度指標
+
+    刪題後的指標以封閉式降階計算，不必重新估計：
+        V_-i  = V - 2 * (C 1)_i + C_ii
+        alpha_-i = (k-1)/(k-2) * (1 - (tr C - C_ii) / V_-i)
+        r_i,T-i  = ((C 1)_i - C_ii) / sqrt(C_ii * V_-i)
+
+    Returns:
+    --------
+    dict
+        alpha, omega (..., )；alpha_if_deleted, item_total_r (..., k)
+    """
+    k = C.shape[-1]
+    diag = np.diagonal(C, axis1=-2, axis2=-1)
+    row = C.sum(axis=-1)
+    V = row.sum(axis=-1)
+    tr = diag.sum(axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        alpha = k / (k - 1) * (1 - tr / V)
+        V_drop = V[..., None] - 2 * row + diag
+        alpha_drop = (k - 1) / (k - 2) * (1 - (tr[..., None] - diag) / V_drop) if k > 2 \
+            else np.full(diag.shape, np.nan)
+        item_total = (row - diag) / np.sqrt(diag * V_drop)
+
+    return {
+        'alpha': alpha,
+        'omega': omega_total(C),
+        'alpha_if_deleted': alpha_drop,
+        'item_total_r': item_total,
+    }
+
+
+def omega_total(C, n_iter=50, tol=1e-6):
+    """
+    McDonald's omega（單因素主軸因素法，標準化題目）
+
+    以 SMC 為初始共同性，批次特徵分解迭代更新；
+    omega = (sum lambda)^2 / ((sum lambda)^2 + sum(1 - lambda^2))
+    """
+    shape = C.shape[:-2]
+    k = C.shape[-1]
+    C = C.reshape(-1, k, k)
+    omega = np.full(len(C), np.nan)
+    usable = np.isfinite(C).all(axis=(1, 2))
+    if not usable.any():
+        return omega.reshape(shape)
+
+    sd = np.sqrt(np.diagonal(C[usable], axis1=1, axis2=2))
+    R = C[usable] / (sd[:, :, None] * sd[:, None, :])
+    idx = np.arange(k)
+    h = 1 - 1 / np.diagonal(np.linalg.pinv(R), axis1=1, axis2=2)
+    for _ in range(n_iter):
+        R_h = R.copy()
+        R_h[:, idx, idx] = h
+        vals, vecs = np.linalg.eigh(R_h)
+        loadings = vecs[:, :, -1] * np.sqrt(np.maximum(vals[:, -1], 0))[:, None]
+        h_new = np.clip(loadings ** 2, 0, 1)
+        converged = np.abs(h_new - h).max() < tol
+        h = h_new
+        if converged:
+            break
+
+    common = np.abs(loadings.sum(axis=1)) ** 2
+    omega[usable] = common / (common + (1 - h).sum(axis=1))
+    return omega.reshape(shape)
+
+
+class ReliabilityAnalyzer:
+    def __init__(self, X, scales, groups=None, weights=None):
+        """
+        態度量表的信度與題目分析
+
+        Parameters:
+        -----------
+        X : DataFrame
+            題目資料，索引為受訪者 ID（有缺失的列會被排除）
+        scales : dict
+            量表名稱對應題目欄位，例如 attitude_groups
+        groups : DataFrame
+            與 X 同順序的分組欄位，例如 demographic_frame 的結果
+        weights : array-like
+            調查權重，None 時不加權
+        """
+        complete = X.notna().all(axis=1).to_numpy()
+        self.X = X[complete]
+        self.scales = scales
+        self.groups = None if groups is None else groups[complete]
+        self.weights = np.ones(complete.sum()) if weights is None \
+            else np.asarray(weights, dtype=float)[complete]
+        self.scale_results = None
+        self.item_results = None
+
+    def _membership(self):
+        """全樣本與各子群的權重列，以及對應的 (grouping, group) 標籤"""
+        rows = [self.weights]
+        labels = [('全體', '全體')]
+        if self.groups is not None:
+            for col in self.groups.columns:
+                codes, levels = pd.factorize(self.groups[col], sort=True)
+                onehot = (codes[None, :] == np.arange(len(levels))[:, None])
+                rows.extend(onehot * self.weights)
+                labels.extend((col, level) for level in levels)
+        return np.array(rows), labels
+
+    def run(self, n_boot=1000, ci=0.95, seed=0, max_elements=2 ** 22):
+        """
+        單次呼叫計算所有量表、所有子群與 bootstrap 信賴區間
+
+        bootstrap 以 Poisson(1) 次數作為重抽權重，與子群權重相乘後
+        和點估計一起放進同一次批次共變異數計算。每批列數由權重列數
+        M = G * (n_boot + 1) 決定，使 M x 列數不超過 max_elements
+        （預設約 4M 個元素，每個權重矩陣 32 MB），與樣本數無關。
+        """
+        rng = np.random.default_rng(seed)
+        values = self.X.to_numpy(dtype=float)
+        base, labels = self._membership()
+        G, n = base.shape
+
+        def weight_block(start, stop):
+            b = base[:, start:stop]
+            boot = rng.poisson(1.0, size=(n_boot, stop - start))
+            return np.concatenate([b, (boot[None, :, :] * b[:, None, :]).reshape(G * n_boot, -1)])
+
+        M = G * (n_boot + 1)
+        chunksize = max(1, max_elements // M)
+        _, cov = _batched_covariances(values, weight_block, M, chunksize=chunksize)
+        point_cov, boot_cov = cov[:G], cov[G:].reshape(G, n_boot, *cov.shape[1:])
+        n_eff = base.sum(axis=1) ** 2 / (base ** 2).sum(axis=1)
+
+        alpha_lo, alpha_hi = (1 - ci) / 2, 1 - (1 - ci) / 2
+        scale_rows, item_rows = [], []
+        for scale, items in self.scales.items():
+            idx = [self.X.columns.get_loc(c) for c in items]
+            sub = np.ix_(idx, idx)
+            point = scale_statistics(point_cov[(slice(None),) + sub])
+            boot_stats = scale_statistics(boot_cov[(slice(None), slice(None)) + sub])
+
+            with np.errstate(all='ignore'):
+                bounds = {
+                    key: np.nanquantile(boot_stats[key], [alpha_lo, alpha_hi], axis=1)
+                    for key in ['alpha', 'omega']
+                }
+            for g, (grouping, group) in enumerate(labels):
+                scale_rows.append([
+                    grouping, group, scale, len(items), int(np.count_nonzero(base[g])), n_eff[g],
+                    point['alpha'][g], bounds['alpha'][0, g], bounds['alpha'][1, g],
+                    point['omega'][g], bounds['omega'][0, g], bounds['omega'][1, g],
+                ])
+                for i, item in enumerate(items):
+                    item_rows.append([grouping, group, scale, item,
+                                      point['alpha_if_deleted'][g, i], point['item_total_r'][g, i]])
+
+        self.scale_results = pd.DataFrame(scale_rows, columns=[
+            'grouping', 'group', 'scale', 'n_items', 'n', 'n_eff',
+            'alpha', 'alpha_lower', 'alpha_upper', 'omega', 'omega_lower', 'omega_upper'
+        ])
+        self.item_results = pd.DataFrame(item_rows, columns=[
+            'grouping', 'group', 'scale', 'item', 'alpha_if_deleted', 'item_total_r'
+        ])
+        return self.scale_results, self.item_results
+
+    def print_summary(self):
+        """列印全體樣本的信度、題目分析與各子群的 alpha"""
+        overall = self.scale_results[self.scale_results['grouping'] == '全體'].set_index('scale')
+        print("\n量表信度分析:")
+        print("=" * 50)
+        for scale, row in overall.iterrows():
+            print(f"{scale}: alpha = {row['alpha']:.3f} [{row['alpha_lower']:.3f}, {row['alpha_upper']:.3f}]"
+                  f"，omega = {row['omega']:.3f} [{row['omega_lower']:.3f}, {row['omega_upper']:.3f}]")
+
+        items = self.item_results[self.item_results['grouping'] == '全體']
+        print("\n題目分析（刪題後 alpha 與校正後題目-總分相關）:")
+        print("=" * 50)
+        print(items.drop(columns=['grouping', 'group']).set_index(['scale', 'item']).round(3))
+
+        groups = self.scale_results[self.scale_results['grouping'] != '全體']
+        if len(groups):
+            print("\n各子群的 Cronbach's alpha:")
+            print("=" * 50)
+            print(groups.pivot_table(index=['grouping', 'group'], columns='scale',
+                                     values='alpha', sort=False).round(3))
+
+
+def main():
+    df = pd.read_csv("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv")
+
+    attitude_groups = {
+        'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],
+        'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],
+        'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],
+        'influence': [f'q26_0{i}_1' for i in range(1, 4)]
+    }
+    attitude_cols = [col for group in attitude_groups.values() for col in group]
+
+    analyzer = ReliabilityAnalyzer(
+        respondent_frame(df, attitude_cols), attitude_groups,
+        groups=demographic_frame(df), weights=respondent_weights(df)
+    )
+    analyzer.run()
+    analyzer.print_summary()
+
+    return analyzer
+
+if __name__ == "__main__":
+    analyzer = main()
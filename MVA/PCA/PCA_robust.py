@@ -0,0 +1,297 @@
+import pandas as pd
+import numpy as np
+from joblib import Parallel, delayed
+
+
+def straightliner_mask(X, blocks=None, min_items=3):
+    """
+    一次向量化找出零變異（直線作答）的受訪者
+
+    Parameters:
+    -----------
+    X : DataFrame
+        題目資料（可含缺失值）
+    blocks : dict
+        題組名稱對應欄位，例如 attitude_groups；提供時另回傳各題組是否直線作答
+    min_items : int
+        至少作答幾題才判斷（避免只答一兩題的人被誤判）
+
+    Returns:
+    --------
+    DataFrame
+        'straightliner' 欄位為所有題目都給同一個答案；其餘欄位為各題組的判斷
+    """
+    values = X.to_numpy(dtype=float)
+
+    def flat(block):
+        answered = (~np.isnan(block)).sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            spread = np.nanmax(block, axis=1) - np.nanmin(block, axis=1)
+        return (answered >= min_items) & (spread == 0)
+
+    with np.errstate(all='ignore'):
+        flags = {'straightliner': flat(values)}
+        for name, cols in (blocks or {}).items():
+            flags[name] = flat(values[:, [X.columns.get_loc(c) for c in cols]])
+    return pd.DataFrame(flags, index=X.index)
+
+
+def _batched_distances(X, loc, cov, chunksize=200000):
+    """S 組位置與共變異數下，每一列的平方 Mahalanobis 距離，形狀 (S, n)"""
+    inv = np.linalg.inv(cov)
+    dist = np.empty((len(loc), len(X)))
+    for start in range(0, len(X), chunksize):
+        D = X[None, start:start + chunksize, :] - loc[:, None, :]
+        dist[:, start:start + chunksize] = np.einsum('snp,spq,snq->sn', D, inv, D)
+    return dist
+
+
+def _subset_moments(X, subsets):
+    """S 個子集的平均與共變異數（加上微小的脊正則化以處理 Likert 資料的重複列）"""
+    Xs = X[subsets]
+    loc = Xs.mean(axis=1)
+    D = Xs - loc[:, None, :]
+    cov = np.einsum('smp,smq->spq', D, D) / (subsets.shape[1] - 1)
+    ridge = 1e-6 * np.trace(cov, axis1=1, axis2=2) / X.shape[1] + 1e-12
+    cov += ridge[:, None, None] * np.eye(X.shape[1])
+    return loc, cov
+
+
+def _c_steps(X, subsets, h, max_steps):
+    """
+    對 S 個起始子集同時做集中步驟 (C-step)
+
+    每一步由子集估計位置與共變異數，再取距離最小的 h 列作為新子集；
+    行列式只會遞減，所有子集都不再變動時提前結束。
+    """
+    for _ in range(max_steps):
+        loc, cov = _subset_moments(X, subsets)
+        dist = _batched_distances(X, loc, cov)
+        new = np.sort(np.argpartition(dist, h - 1, axis=1)[:, :h], axis=1)
+        if new.shape == subsets.shape and (new == subsets).all():
+            break
+        subsets = new
+    loc, cov = _subset_moments(X, subsets)
+    return subsets, np.linalg.slogdet(cov)[1]
+
+
+def fast_mcd(X, support_fraction=0.75, n_starts=500, n_best=10, max_sample=5000,
+             n_jobs=-1, batch_size=50, seed=0):
+    """
+    FastMCD 穩健位置與共變異數 (Rousseeuw & Van Driessen, 1999)
+
+    隨機起始子集分批在子樣本上平行做兩次 C-step，保留行列式最小的
+    n_best 組，再於全部資料上迭代到收斂，最後做一致性校正與重新加權。
+
+    Parameters:
+    -----------
+    X : ndarray, shape (n, p)
+        完整資料
+    support_fraction : float
+        h / n，決定可抵抗的離群比例（1 - support_fraction）
+    n_starts : int
+        隨機起始子集數
+    max_sample : int
+        第一階段使用的子樣本上限，大樣本時維持固定成本
+
+    Returns:
+    --------
+    location, covariance : ndarray
+        重新加權後的穩健估計
+    distances : ndarray
+        每列的穩健平方距離
+    """
+    from scipy.stats import chi2
+
+    rng = np.random.default_rng(seed)
+    n, p = X.shape
+    h = int(np.ceil(support_fraction * n))
+
+    # 第一階段：子樣本上的隨機起始（p + 1 個點），分批平行
+    sub = X[rng.choice(n, size=min(n, max_sample), replace=False)]
+    h_sub = int(np.ceil(support_fraction * len(sub)))
+    starts = np.argsort(rng.random((n_starts, len(sub))), axis=1)[:, :p + 1]
+    batches = [starts[i:i + batch_size] for i in range(0, n_starts, batch_size)]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_c_steps)(sub, batch, h_sub, 2) for batch in batches
+    )
+    subsets = np.concatenate([r[0] for r in results])
+    logdet = np.concatenate([r[1] for r in results])
+    best = np.argsort(logdet)[:n_best]
+
+    # 第二階段：最佳的幾組在全部資料上迭代到收斂
+    loc, cov = _subset_moments(sub, subsets[best])
+    dist = _batched_distances(X, loc, cov)
+    full = np.sort(np.argpartition(dist, h - 1, axis=1)[:, :h], axis=1)
+    full, logdet = _c_steps(X, full, h, 100)
+    support = full[np.argmin(logdet)]
+
+    # 一致性校正後，以 97.5% 卡方分位數重新加權
+    loc, cov = _subset_moments(X, support[None, :])
+    dist = _batched_distances(X, loc, cov)[0]
+    cov = cov * np.median(dist) / chi2.ppf(0.5, p)
+    dist = _batched_distances(X, loc, cov)[0]
+
+    inliers = np.flatnonzero(dist <= chi2.ppf(0.975, p))
+    loc, cov = _subset_moments(X, inliers[None, :])
+    dist = _batched_distances(X, loc, cov)[0]
+    cov = cov * np.median(dist) / chi2.ppf(0.5, p)
+    dist = _batched_distances(X, loc, cov)[0]
+    return loc[0], cov[0], dist
+
+
+def _robust_scale(X):
+    """以 MAD 估計尺度，MAD 為 0（Likert 題過半同一答案）時改用 IQR，再不行用標準差"""
+    median = np.median(X, axis=0)
+    scale = 1.4826 * np.median(np.abs(X - median), axis=0)
+    q75, q25 = np.percentile(X, [75, 25], axis=0)
+    scale = np.where(scale > 0, scale, (q75 - q25) / 1.349)
+    return median, np.where(scale > 0, scale, X.std(axis=0))
+
+
+def spatial_sign_pca(X, max_iter=100, tol=1e-8):
+    """
+    空間符號共變異數 PCA (Visuri et al., 2000)
+
+    以 MAD 穩健標準化後，減去空間中位數（Weiszfeld 迭代）並投影到單位球面，
+    特徵向量取自空間符號共變異數，特徵值則改用各主成分得分的 MAD 平方。
+    """
+    median, scale = _robust_scale(X)
+    Z = (X - median) / scale
+
+    center = np.median(Z, axis=0)
+    for _ in range(max_iter):
+        norm = np.maximum(np.linalg.norm(Z - center, axis=1), 1e-12)
+        new = (Z / norm[:, None]).sum(axis=0) / (1 / norm).sum()
+        if np.linalg.norm(new - center) < tol:
+            break
+        center = new
+
+    D = Z - center
+    U = D / np.maximum(np.linalg.norm(D, axis=1), 1e-12)[:, None]
+    _, eigvecs = np.linalg.eigh(U.T @ U / len(U))
+    scores = D @ eigvecs
+    _, score_scale = _robust_scale(scores)
+    eigvals = score_scale ** 2
+
+    order = np.argsort(eigvals)[::-1]
+    return median + center * scale, scale, eigvals[order], eigvecs[:, order]
+
+
+class RobustPCA:
+    def __init__(self, n_components=None, method='mcd', support_fraction=0.75,
+                 n_starts=500, blocks=None, n_jobs=-1, seed=0):
+        """
+        抵抗直線作答與離群受訪者的穩健 PCA
+
+        介面與 sklearn 的 PCA 相容（components_、explained_variance_、
+        explained_variance_ratio_、n_components_），與 do_pca 相同地對
+        相關矩陣做分解。直線作答者不參與估計，但仍會計算得分並標記。
+
+        Parameters:
+        -----------
+        n_components : int
+            主成分數，None 時依 Kaiser 準則與 80% 解釋變異量選擇
+        method : str
+            'mcd'（FastMCD 共變異數）或 'spatial'（空間符號共變異數）
+        support_fraction : float
+            MCD 的 h / n
+        blocks : dict
+            直線作答檢查的題組，例如 attitude_groups；None 時不做預先篩選
+        """
+        self.n_components = n_components
+        self.method = method
+        self.support_fraction = support_fraction
+        self.n_starts = n_starts
+        self.blocks = blocks
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.location_ = None
+        self.scale_ = None
+        self.components_ = None
+        self.explained_variance_ = None
+        self.explained_variance_ratio_ = None
+        self.n_components_ = None
+        self.eigenvalues_ = None
+        self.flags = None
+        self.scores = None
+
+    def fit(self, X):
+        """
+        估計穩健主成分
+
+        Parameters:
+        -----------
+        X : DataFrame
+            完整（無缺失）的題目資料，索引為受訪者 ID
+        """
+        from scipy.stats import chi2
+
+        values = X.to_numpy(dtype=float)
+        n, p = values.shape
+
+        if self.blocks is not None:
+            flags = straightliner_mask(X, self.blocks)
+        else:
+            flags = pd.DataFrame({'straightliner': np.zeros(n, dtype=bool)}, index=X.index)
+        keep = ~flags['straightliner'].to_numpy()
+
+        if self.method == 'mcd':
+            loc, cov, _ = fast_mcd(values[keep], self.support_fraction, self.n_starts,
+                                   n_jobs=self.n_jobs, seed=self.seed)
+            scale = np.sqrt(np.diag(cov))
+            eigvals, eigvecs = np.linalg.eigh(cov / np.outer(scale, scale))
+            order = np.argsort(eigvals)[::-1]
+            eigvals, eigvecs = eigvals[order], eigvecs[:, order]
+        elif self.method == 'spatial':
+            loc, scale, eigvals, eigvecs = spatial_sign_pca(values[keep])
+        else:
+            raise ValueError(f"未知的穩健方法: {self.method}")
+
+        # 所有受訪者（含直線作答者）的穩健距離
+        Z = (values - loc) / scale
+        all_scores = Z @ eigvecs
+        distance = (all_scores ** 2 / eigvals).sum(axis=1)
+
+        k = self.n_components
+        if k is None:
+            k = sum(eigvals > 1)
+            k_var = np.argmax(np.cumsum(eigvals / eigvals.sum()) > 0.8) + 1
+            k = max(1, min(k, k_var))
+
+        self.location_ = loc
+        self.scale_ = scale
+        self.eigenvalues_ = eigvals
+        self.n_components_ = k
+        self.components_ = eigvecs[:, :k].T
+        self.explained_variance_ = eigvals[:k]
+        self.explained_variance_ratio_ = eigvals[:k] / eigvals.sum()
+
+        flags['robust_distance'] = distance
+        flags['outlier'] = flags['straightliner'] | (distance > chi2.ppf(0.975, p))
+        self.flags = flags
+        self.scores = pd.DataFrame(all_scores[:, :k], index=X.index,
+                                   columns=[f'PC{i+1}' for i in range(k)])
+        return self
+
+    def transform(self, X):
+        """以穩健位置與尺度標準化後投影"""
+        return ((np.asarray(X, dtype=float) - self.location_) / self.scale_) @ self.components_.T
+
+    def fit_transform(self, X):
+        """主成分得分，附上直線作答與離群標記"""
+        self.fit(X)
+        return self.scores.join(self.flags[['straightliner', 'outlier']])
+
+    def print_summary(self):
+        """列印篩選與離群標記的人數"""
+        n = len(self.flags)
+        n_flat = int(self.flags['straightliner'].sum())
+        n_out = int(self.flags['outlier'].sum())
+        print(f"\n穩健 PCA（{self.method}）:")
+        print("=" * 50)
+        print(f"直線作答者: {n_flat} 人 ({n_flat / n:.2%})")
+        print(f"標記為離群: {n_out} 人 ({n_out / n:.2%})，含直線作答者")
+        if self.blocks:
+            print("\n各題組直線作答比例:")
+            print(self.flags[list(self.blocks)].mean().round(4))
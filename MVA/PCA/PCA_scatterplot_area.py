@@ -1,9 +1,5 @@
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
 import matplotlib.pyplot as plt
-import seaborn as sns
+from PCA_score_store import open_or_build
 
 def plot_pc_scores_scatter(pc_scores, pc_x=1, pc_y=2):
     """
@@ -115,53 +111,10 @@ def create_separate_legends(fig):
     return legend_fig
 
 def main():
-    # 讀取數據
-    df = pd.read_csv("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv")
-    
-    # 準備年齡組別數據
-    bins = [33, 63, 73, 83, 91]
-    labels = ['33-63', '63-73', '73-83', '83-91']
-    df['age_group'] = pd.cut(df['q2'], bins=bins, labels=labels, include_lowest=True)
-    
-    # 準備地區數據
-    region_map = {
-        1: '北部', 2: '北部', 3: '北部', 4: '北部', 5: '北部',
-        6: '北部',
-        7: '中部', 8: '中部', 9: '中部', 10: '中部',
-        11: '中部', 12: '中部', 13: '中部',
-        14: '南部', 15: '南部', 16: '南部',
-        17: '東部', 18: '東部', 19: '東部',
-        20: '其他', 21: '其他', 22: '其他', 23: '其他', 24: '其他'
-    }
-    df['region'] = df['q3'].map(region_map)
-    
-    # 準備性別標籤
-    df['gender_label'] = df['q1'].map({1.0: '男性', 2.0: '女性'})
-    
-    # 準備 PCA 數據
-    attitude_groups = {
-        'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],
-        'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],
-        'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],
-        'influence': [f'q26_0{i}_1' for i in range(1, 4)]
-    }
-    attitude_cols = [col for group in attitude_groups.values() for col in group]
-    
-    # 執行 PCA
-    X = df[attitude_cols].dropna()
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    pca = PCA(n_components=4)
-    X_pca = pca.fit_transform(X_scaled)
-    
-    # 準備繪圖數據
-    pc_scores = pd.DataFrame(
-        X_pca,
-        columns=[f'PC{i+1}' for i in range(4)]
-    )
-    pc_scores['age_group'] = df['age_group']
-    pc_scores['gender_label'] = df['gender_label']
-    pc_scores['region'] = df['region']
+    # 開啟主成分得分存放區（不存在時才執行 PCA 並建立）
+    store = open_or_build("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv",
+                          n_components=4)
+    pc_scores = store.frame([f'PC{i+1}' for i in range(4)])
     
     # 繪製 PC1 vs PC2 散點圖
     scatter_plot = plot_pc_scores_scatter(pc_scores, pc_x=3, pc_y=2)
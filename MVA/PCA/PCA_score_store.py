@@ -0,0 +1,273 @@
+import os
+import json
+import hashlib
+import pandas as pd
+import numpy as np
+from PCA_ingest import decode_demographics
+
+# 預設存放區位置（MVA/pc_score_store），與 cli.py 相同，不受目前工作目錄影響
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'pc_score_store')
+
+
+# 人口變數編碼的版本；demographic_frame 的欄位或編碼簿改變時遞增，舊存放區會重建
+CODEBOOK_VERSION = 2
+
+
+def model_hash(components, columns, **params):
+    """以負荷量、題目順序與模型參數計算模型雜湊值"""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(components, dtype=np.float64).tobytes())
+    h.update(json.dumps(list(columns), ensure_ascii=False).encode('utf-8'))
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def source_fingerprint(path, chunk=1 << 20):
+    """資料檔的大小、修改時間與內容雜湊值，用來判斷存放區是否過期"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'sha1': h.hexdigest()}
+
+
+def source_changed(recorded, path):
+    """
+    資料檔是否與建立存放區時不同
+
+    大小與修改時間都相同時視為未變更；否則再比對內容雜湊值，
+    只是被複製或 touch 過的相同檔案不會觸發重建。資料檔不存在時
+    無從比對也無法重建，沿用既有存放區。
+    """
+    if not os.path.exists(path):
+        return False
+    if not isinstance(recorded, dict):
+        return True
+    stat = os.stat(path)
+    if stat.st_size != recorded.get('size'):
+        return True
+    if stat.st_mtime_ns == recorded.get('mtime_ns'):
+        return False
+    return source_fingerprint(path)['sha1'] != recorded.get('sha1')
+
+
+def demographic_frame(df, id_col='id'):
+    """建立年齡組別、地區、性別與上網時間標籤（依 PCA_ingest 的共同編碼簿），以受訪者 ID 為索引"""
+    bins = [33, 63, 73, 83, 91]
+    labels = ['33-63', '63-73', '73-83', '83-91']
+    decoded = decode_demographics(df)
+
+    demographics = pd.DataFrame({
+        'age_group': pd.cut(df['q2'], bins=bins, labels=labels, include_lowest=True),
+        'region': decoded['region'],
+        'gender_label': decoded['gender_label'],
+    }, index=df.index)
+    if 'internet_usage' in decoded.columns:
+        demographics['internet_usage'] = decoded['internet_usage']
+    if id_col in df.columns:
+        demographics.index = df[id_col]
+    return demographics
+
+
+class PCScoreStore:
+    def __init__(self, directory):
+        """
+        主成分得分存放區
+
+        目錄結構：
+            scores.npy        float32 得分矩陣 (n, k)，以記憶體映射開啟
+            ids.npy           受訪者 ID
+            weights.npy       調查權重（選用）
+            codes_<欄位>.npy   人口變數代碼（-1 為缺失）
+            meta.json         模型雜湊值、主成分數、欄位順序與人口變數類別
+        """
+        self.directory = directory
+        self.meta = None
+        self.scores = None
+        self.ids = None
+        self.weights = None
+        self.codes = {}
+
+    @classmethod
+    def write(cls, directory, scores, demographics=None, weights=None, **model_info):
+        """
+        寫入得分與人口變數
+
+        Parameters:
+        -----------
+        scores : DataFrame
+            主成分得分，索引為受訪者 ID
+        demographics : DataFrame
+            類別型人口變數，依受訪者 ID 與 scores 對齊
+        weights : array-like
+            調查權重（與 scores 同順序），None 時不寫入
+        model_info : dict
+            寫入 meta.json 的模型資訊（例如 model_hash）
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        mm = np.lib.format.open_memmap(os.path.join(directory, 'scores.npy'), mode='w+',
+                                       dtype=np.float32, shape=scores.shape)
+        mm[:] = scores.to_numpy(dtype=np.float32)
+        mm.flush()
+        del mm
+
+        ids = np.asarray(scores.index)
+        if ids.dtype == object:
+            ids = ids.astype(str)
+        np.save(os.path.join(directory, 'ids.npy'), ids)
+        if weights is not None:
+            np.save(os.path.join(directory, 'weights.npy'), np.asarray(weights, dtype=np.float32))
+
+        categories = {}
+        if demographics is not None:
+            demographics = demographics.reindex(scores.index)
+            for col in demographics.columns:
+                values = pd.Categorical(demographics[col])
+                dtype = np.int8 if len(values.categories) < 127 else np.int32
+                np.save(os.path.join(directory, f'codes_{col}.npy'), values.codes.astype(dtype))
+                categories[col] = [str(c) for c in values.categories]
+
+        meta = {
+            'n_rows': int(scores.shape[0]),
+            'n_components': int(scores.shape[1]),
+            'columns': [str(c) for c in scores.columns],
+            'demographics': categories,
+            'weighted': weights is not None,
+        }
+        meta.update(model_info)
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        return cls.open(directory)
+
+    @classmethod
+    def open(cls, directory):
+        """以記憶體映射開啟存放區（不複製得分資料）"""
+        store = cls(directory)
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            store.meta = json.load(f)
+
+        store.scores = np.load(os.path.join(directory, 'scores.npy'), mmap_mode='r')
+        store.ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r')
+        if store.meta.get('weighted'):
+            store.weights = np.load(os.path.join(directory, 'weights.npy'), mmap_mode='r')
+        for col in store.meta['demographics']:
+            store.codes[col] = np.load(os.path.join(directory, f'codes_{col}.npy'), mmap_mode='r')
+        return store
+
+    @property
+    def columns(self):
+        return self.meta['columns']
+
+    def labels(self, col):
+        """人口變數的類別標籤（由代碼還原）"""
+        return pd.Categorical.from_codes(np.asarray(self.codes[col]),
+                                         categories=self.meta['demographics'][col])
+
+    def mask(self, **filters):
+        """依人口變數篩選，例如 mask(region='北部', gender_label='女性')"""
+        mask = np.ones(self.meta['n_rows'], dtype=bool)
+        for col, value in filters.items():
+            code = self.meta['demographics'][col].index(value)
+            mask &= self.codes[col] == code
+        return mask
+
+    def select(self, pcs=None, **filters):
+        """取出符合條件的受訪者得分"""
+        cols = [self.columns.index(pc) for pc in pcs] if pcs else slice(None)
+        if not filters:
+            return self.scores[:, cols]
+        return self.scores[self.mask(**filters)][:, cols]
+
+    def group_indices(self, col):
+        """回傳 {類別: 列索引}，以一次穩定排序完成分組"""
+        codes = np.asarray(self.codes[col])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(-1, len(self.meta['demographics'][col]) + 1))
+        return {label: order[bounds[i + 1]:bounds[i + 2]]
+                for i, label in enumerate(self.meta['demographics'][col])}
+
+    def frame(self, pcs=None):
+        """組成繪圖用的 DataFrame（PC 得分加上人口變數標籤，有權重時附 weight 欄位）"""
+        pcs = pcs or self.columns
+        pc_scores = pd.DataFrame(self.select(pcs), columns=pcs, index=pd.Index(self.ids, name='id'))
+        if self.weights is not None:
+            pc_scores['weight'] = np.asarray(self.weights, dtype=float)
+        for col in self.meta['demographics']:
+            pc_scores[col] = self.labels(col)
+        return pc_scores
+
+
+def build_store(data_path, directory, n_components=4, n_imputations=20, id_col='id',
+                correlation='pearson'):
+    """
+    由原始問卷執行多重插補 PCA，並將得分與人口變數寫入存放區
+
+    correlation='polychoric' 時改以多分格相關矩陣分解，不需插補
+    """
+    from PCA_impute import MultipleImputationPCA, respondent_frame
+    from PCA_weights import respondent_weights, is_uniform, nan_standardize
+
+    df = pd.read_csv(data_path)
+    attitude_groups = {
+        'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],
+        'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],
+        'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],
+        'influence': [f'q26_0{i}_1' for i in range(1, 4)]
+    }
+    attitude_cols = [col for group in attitude_groups.values() for col in group]
+
+    X = respondent_frame(df, attitude_cols, id_col)
+    weights = respondent_weights(df, id_col=id_col)
+    weights = None if is_uniform(weights) else weights.to_numpy()
+
+    if correlation == 'polychoric':
+        from PCA_polychoric import polychoric_correlation, CorrelationPCA
+
+        w = np.ones(len(X)) if weights is None else weights
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(directory)), 'polychoric_cache')
+        pca = CorrelationPCA(n_components).fit(polychoric_correlation(X, weights, cache_dir=cache_dir))
+        scores = pd.DataFrame(pca.transform(nan_standardize(X, w)), index=X.index,
+                              columns=[f'PC{i+1}' for i in range(n_components)])
+        method_info = {'method': 'polychoric_pca'}
+    else:
+        pca = MultipleImputationPCA(X, n_imputations=n_imputations, weights=weights)
+        scores = pca.fit_transform(n_components)
+        method_info = {'method': 'multiple_imputation_pca', 'n_imputations': n_imputations}
+
+    return PCScoreStore.write(
+        directory, scores, demographic_frame(df, id_col), weights,
+        model_hash=model_hash(pca.components_, attitude_cols, correlation=correlation,
+                              n_imputations=n_imputations),
+        correlation=correlation,
+        codebook_version=CODEBOOK_VERSION,
+        source=source_fingerprint(data_path),
+        **method_info,
+    )
+
+
+def open_or_build(data_path, directory=DEFAULT_STORE_DIR, n_components=4, correlation='pearson',
+                  n_imputations=20):
+    """
+    存放區是最新的時直接開啟，否則重新建立
+
+    以下任一不符時重建：主成分數不足、相關係數種類或插補次數不同、
+    資料檔在建立後有變更（見 source_changed）、人口變數編碼版本不同
+    （CODEBOOK_VERSION）。
+    """
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        store = PCScoreStore.open(directory)
+        meta = store.meta
+        stale = source_changed(meta.get('source'), data_path) or \
+            meta.get('codebook_version') != CODEBOOK_VERSION
+        if meta['n_components'] >= n_components and not stale and \
+                meta.get('correlation', 'pearson') == correlation and \
+                meta.get('n_imputations', n_imputations) == n_imputations:
+            return store
+        print(f"主成分得分存放區已過期，重新建立: {directory}")
+    return build_store(data_path, directory, n_components, n_imputations=n_imputations,
+                       correlation=correlation)
@@ -1,19 +1,46 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from factor_analyzer.factor_analyzer import calculate_kmo
-from scipy.stats import chi2
+from PCA_impute import run_imputations, pooled_correlation, respondent_frame
+from PCA_weights import respondent_weights, weighted_corr, effective_n, is_uniform
+from PCA_polychoric import polychoric_correlation
+
+def calculate_kmo_from_corr(corr):
+    """
+    由相關矩陣計算 KMO（與 factor_analyzer.calculate_kmo 相同公式）
+
+    只依賴 numpy，快速檢查時不必載入 factor_analyzer 與 scikit-learn。
+    """
+    corr = np.asarray(corr)
+    inv = np.linalg.inv(corr)
+    partial = -inv / np.sqrt(np.outer(np.diag(inv), np.diag(inv)))
+    
+    corr_sq = corr ** 2
+    partial_sq = partial ** 2
+    np.fill_diagonal(corr_sq, 0)
+    np.fill_diagonal(partial_sq, 0)
+    
+    kmo_per_item = corr_sq.sum(axis=0) / (corr_sq.sum(axis=0) + partial_sq.sum(axis=0))
+    kmo_total = corr_sq.sum() / (corr_sq.sum() + partial_sq.sum())
+    return kmo_per_item, kmo_total
 
 class PCATestAnalyzer:
-    def __init__(self, data_path):
-        """初始化 PCA 分析器"""
+    def __init__(self, data_path, weight_col='weight'):
+        """初始化 PCA 分析器；資料含權重欄位時，KMO 與 Bartlett 檢定預設加權"""
         self.df = pd.read_csv(data_path)
+        self.weight_col = weight_col
+        self.weights = None
         self.X = None
         self.attitude_cols = None
         self.attitude_groups = None
+        self.corr = None
         
-    def prepare_data(self):
-        """準備數據"""
+    def prepare_data(self, impute=False, n_imputations=20, correlation='pearson'):
+        """
+        準備數據；impute=True 時保留所有受訪者，以多重插補合併的相關矩陣進行檢定
+
+        correlation 為 'polychoric' 時改用多分格相關（缺失值成對刪除），
+        也可直接傳入以題目為索引的相關矩陣 DataFrame
+        """
         self.attitude_groups = {
             'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],  # 觀察到的網路行為
             'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],  # 個人網路行為
@@ -22,13 +49,33 @@ class PCATestAnalyzer:
         }
         
         self.attitude_cols = [col for group in self.attitude_groups.values() for col in group]
-        self.X = self.df[self.attitude_cols].dropna()
+        self.X = respondent_frame(self.df, self.attitude_cols)
+        self.weights = respondent_weights(self.df, self.weight_col)
+        if impute and self.X.isna().any().any():
+            # 多分格相關以成對刪除處理缺失值，不需插補
+            if isinstance(correlation, str) and correlation == 'pearson':
+                results = run_imputations(self.X.to_numpy(dtype=float), n_imputations,
+                                          weights=self.weights.to_numpy())
+                self.corr = pd.DataFrame(pooled_correlation(results),
+                                         index=self.attitude_cols, columns=self.attitude_cols)
+        else:
+            complete = self.X.notna().all(axis=1).to_numpy()
+            self.X = self.X[complete]
+            self.weights = self.weights[complete]
+            if not is_uniform(self.weights):
+                self.corr = weighted_corr(self.X, self.weights)
+        
+        if isinstance(correlation, pd.DataFrame):
+            self.corr = correlation.loc[self.attitude_cols, self.attitude_cols]
+        elif correlation == 'polychoric':
+            self.corr = polychoric_correlation(self.X, self.weights)
         
     def perform_kmo_test(self):
         """執行 KMO 檢定"""
         try:
             # 使用相關矩陣進行KMO檢定
-            kmo_all, kmo_model = calculate_kmo(self.X)
+            correlation_matrix = self.X.corr() if self.corr is None else self.corr
+            kmo_all, kmo_model = calculate_kmo_from_corr(correlation_matrix)
             
             print("\nKMO 檢定結果:")
             print("=" * 50)
@@ -58,9 +105,12 @@ class PCATestAnalyzer:
         
     def perform_bartlett_test(self):
         """執行 Bartlett's 球形檢定"""
+        from scipy.stats import chi2
+        
         try:
-            correlation_matrix = self.X.corr()
-            n = len(self.X)
+            correlation_matrix = self.X.corr() if self.corr is None else self.corr
+            # 加權時以 Kish 有效樣本數取代 n
+            n = effective_n(self.weights)
             p = len(self.X.columns)
             chi_square = -(n - 1 - (2 * p + 5) / 6) * np.log(np.linalg.det(correlation_matrix))
             df = p * (p - 1) / 2
@@ -91,6 +141,8 @@ class PCATestAnalyzer:
         print("\n樣本適切性分析:")
         print("=" * 50)
         print(f"樣本數量: {n_samples}")
+        if not is_uniform(self.weights):
+            print(f"有效樣本數（加權）: {effective_n(self.weights):.1f}")
         print(f"變數數量: {n_variables}")
         print(f"樣本數/變數數比例: {n_samples/n_variables:.2f}")
         
@@ -110,7 +162,7 @@ def main():
     analyzer = PCATestAnalyzer("/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv")
     
     # 準備數據
-    analyzer.prepare_data()
+    analyzer.prepare_data(impute=True)
     
     # 執行檢定
     analyzer.calculate_sample_adequacy()
@@ -0,0 +1,147 @@
+import pandas as pd
+import numpy as np
+from PCA_loading import PCAAnalyzer
+from PCA_ingest import ingest_waves
+from PCA_weights import is_uniform, weighted_standardize, nan_moments
+
+
+class WaveComparison:
+    def __init__(self, n_components=4, reference=None):
+        """
+        跨波次 PCA 解的比較
+
+        Parameters:
+        -----------
+        n_components : int
+            每一波固定的主成分數（不同波次需一致才能比較）
+        reference : str
+            共同參考空間所用的波次，預設為第一個加入的波次
+        """
+        self.n_components = n_components
+        self.reference = reference
+        self.waves = {}
+        self.rotations = None
+        self.congruence = None
+        self.angles = None
+
+    def add_wave(self, wave_id, loadings, X, weights=None):
+        """
+        加入一個已估計的波次模型（負荷量與用於標準化的題目資料）
+
+        weights 為與 X 同順序的調查權重；權重不均等時以加權平均與標準差
+        標準化，與 PCAAnalyzer.do_pca 估計負荷量時的標準化一致。
+        """
+        loadings = loadings.iloc[:, :self.n_components]
+        X = X[loadings.index]
+        if weights is None or is_uniform(weights):
+            mean, scale = X.mean().to_numpy(dtype=float), X.std(ddof=0).to_numpy(dtype=float)
+        elif X.isna().any().any():
+            mean, scale = nan_moments(X, weights)
+        else:
+            _, mean, scale = weighted_standardize(X, weights)
+        self.waves[wave_id] = {
+            'loadings': loadings.to_numpy(dtype=float),
+            'mean': mean,
+            'scale': scale,
+            'X': X,
+        }
+        if self.reference is None:
+            self.reference = wave_id
+
+    def fit_wave(self, wave_id, data, impute=False):
+        """以 PCAAnalyzer 流程估計單一波次（data 為檔案路徑或 DataFrame）"""
+        analyzer = PCAAnalyzer(data)
+        analyzer.prepare_data(impute=impute)
+        analyzer.do_pca(n_components=self.n_components)
+        self.add_wave(wave_id, analyzer.loadings, analyzer.X, analyzer.weights)
+        return analyzer
+
+    def compare(self):
+        """
+        以單次批次計算比較所有波次組合
+
+        L_i.T @ L_j 堆疊成 (W, W, k, k)，一次批次 SVD 同時得到：
+        - 正交 Procrustes 轉軸 R_ij = U @ Vt（將 L_i 對齊到 L_j）
+        - 子空間主角度 arccos(奇異值)
+        對齊後逐成分計算 Tucker 一致性係數。
+        """
+        wave_ids = list(self.waves)
+        L = np.stack([self.waves[w]['loadings'] for w in wave_ids])  # (W, p, k)
+
+        M = np.einsum('ipk,jpl->ijkl', L, L)
+        U, s, Vt = np.linalg.svd(M)
+        self.rotations = U @ Vt
+
+        aligned = np.einsum('ipk,ijkl->ijpl', L, self.rotations)
+        num = np.einsum('ijpl,jpl->ijl', aligned, L)
+        den = np.sqrt(np.einsum('ijpl,ijpl->ijl', aligned, aligned) *
+                      np.einsum('jpl,jpl->jl', L, L)[None, :, :])
+        congruence = num / den
+        angles = np.degrees(np.arccos(np.clip(s, -1, 1)))
+
+        pcs = [f'PC{i+1}' for i in range(self.n_components)]
+        index = pd.MultiIndex.from_product([wave_ids, wave_ids], names=['wave', 'target'])
+        self.congruence = pd.DataFrame(congruence.reshape(-1, self.n_components),
+                                       index=index, columns=pcs)
+        self.angles = pd.DataFrame(angles.reshape(-1, self.n_components), index=index,
+                                   columns=[f'angle{i+1}' for i in range(self.n_components)])
+        self._wave_ids = wave_ids
+        return self.congruence, self.angles
+
+    def project(self):
+        """
+        將所有波次的受訪者投影到參考波次的主成分空間
+
+        各波次以參考波次的平均與標準差標準化後，堆疊成一個矩陣，
+        以一次矩陣乘法投影，波次間的平均差異因此得以保留。
+        缺失值以參考平均代入（標準化後為 0）。
+        """
+        ref = self.waves[self.reference]
+        frames = [w['X'] for w in self.waves.values()]
+        X_all = pd.concat(frames, keys=list(self.waves), names=['wave', 'id'])
+
+        Z = (X_all.to_numpy(dtype=float) - ref['mean']) / ref['scale']
+        Z = np.nan_to_num(Z, nan=0.0)
+        scores = Z @ ref['loadings']
+
+        return pd.DataFrame(scores, index=X_all.index,
+                            columns=[f'PC{i+1}' for i in range(self.n_components)])
+
+    def print_summary(self):
+        """列印各波次對參考波次的一致性係數與子空間角度"""
+        ref = self.reference
+        congruence = self.congruence.xs(ref, level='target')
+        angles = self.angles.xs(ref, level='target')
+
+        print(f"\n各波次對參考波次 {ref} 的 Tucker 一致性係數（Procrustes 對齊後）:")
+        print("=" * 50)
+        print(congruence.round(3))
+        print(f"\n各波次與參考波次 {ref} 的子空間主角度（度）:")
+        print("=" * 50)
+        print(angles.round(2))
+
+
+def main(wave_paths=None, rename=None, recode=None):
+    # 各波次的問卷資料（依實際檔案路徑調整）
+    if wave_paths is None:
+        wave_paths = {
+            '2021': "/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv",
+        }
+
+    # 同時讀取所有波次並依編碼簿對齊欄位與代碼
+    data = ingest_waves(wave_paths, rename, recode)
+
+    comparison = WaveComparison(n_components=4)
+    for wave_id, wave_data in data.groupby('wave', observed=True, sort=False):
+        comparison.fit_wave(wave_id, wave_data)
+
+    comparison.compare()
+    comparison.print_summary()
+    scores = comparison.project()
+    print("\n各波次在參考空間中的主成分平均:")
+    print(scores.groupby(level='wave').mean().round(3))
+
+    return comparison, scores
+
+if __name__ == "__main__":
+    comparison, scores = main()
@@ -0,0 +1,165 @@
+import pandas as pd
+import numpy as np
+
+WEIGHT_COL = 'weight'
+
+
+def respondent_weights(df, weight_col=WEIGHT_COL, id_col='id'):
+    """
+    取出調查權重並正規化為平均 1（總和等於樣本數），以受訪者 ID 為索引
+
+    沒有權重欄位時回傳全為 1 的權重，結果與未加權完全相同。
+    """
+    if weight_col in df.columns:
+        w = df[weight_col].astype(float)
+        w = w / w.mean()
+    else:
+        w = pd.Series(1.0, index=df.index)
+    if id_col in df.columns:
+        w.index = df[id_col]
+    return w.rename(WEIGHT_COL)
+
+
+def is_uniform(weights):
+    """權重是否全部相同（可走未加權的快速路徑）"""
+    w = np.asarray(weights, dtype=float)
+    return w.size == 0 or np.ptp(w) == 0
+
+
+def effective_n(weights):
+    """Kish 有效樣本數 (sum w)^2 / sum w^2"""
+    w = np.asarray(weights, dtype=float)
+    return w.sum() ** 2 / (w ** 2).sum()
+
+
+def weighted_moments(X, weights):
+    """
+    加權平均與共變異數
+
+    權重先正規化為總和 n，共變異數除以 n - 1，權重全為 1 時與
+    np.cov 相同；只比未加權多一次逐列乘法。
+    """
+    X = np.asarray(X, dtype=float)
+    w = np.asarray(weights, dtype=float)
+    w = w * len(w) / w.sum()
+    mean = w @ X / len(w)
+    D = X - mean
+    cov = (D * w[:, None]).T @ D / (len(w) - 1)
+    return mean, cov
+
+
+def weighted_standardize(X, weights):
+    """以加權平均與標準差標準化，回傳 (Z, mean, std)"""
+    mean, cov = weighted_moments(X, weights)
+    std = np.sqrt(np.diag(cov))
+    return (np.asarray(X, dtype=float) - mean) / std, mean, std
+
+
+def nan_moments(X, weights):
+    """含缺失值資料的加權平均與標準差，各欄只用有作答的列"""
+    values = np.asarray(X, dtype=float)
+    observed = ~np.isnan(values)
+    w = np.asarray(weights, dtype=float)[:, None] * observed
+    mean = np.nansum(values * w, axis=0) / w.sum(axis=0)
+    std = np.sqrt(np.nansum((values - mean) ** 2 * w, axis=0) / w.sum(axis=0))
+    return mean, std
+
+
+def nan_standardize(X, weights):
+    """含缺失值資料的加權標準化（見 nan_moments）；缺失值標準化後以 0（平均）代入"""
+    mean, std = nan_moments(X, weights)
+    return np.nan_to_num((np.asarray(X, dtype=float) - mean) / std)
+
+
+def weighted_corr(X, weights):
+    """加權相關矩陣；X 為 DataFrame 時保留欄位名稱"""
+    _, cov = weighted_moments(X, weights)
+    std = np.sqrt(np.diag(cov))
+    corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, 1.0)
+    if isinstance(X, pd.DataFrame):
+        return pd.DataFrame(corr, index=X.columns, columns=X.columns)
+    return corr
+
+
+class WeightedPCA:
+    def __init__(self, n_components=None):
+        """
+        加權 PCA（對加權共變異數做特徵分解）
+
+        介面與 sklearn 的 PCA 相容（components_、explained_variance_、
+        explained_variance_ratio_、n_components_、fit_transform）。
+        """
+        self.n_components = n_components
+        self.mean_ = None
+        self.components_ = None
+        self.explained_variance_ = None
+        self.explained_variance_ratio_ = None
+        self.n_components_ = None
+
+    def fit(self, X, weights):
+        mean, cov = weighted_moments(X, weights)
+        eigvals, eigvecs = np.linalg.eigh(cov)
+        order = np.argsort(eigvals)[::-1]
+        eigvals, eigvecs = eigvals[order], eigvecs[:, order]
+
+        k = self.n_components or len(eigvals)
+        self.mean_ = mean
+        self.n_components_ = k
+        self.components_ = eigvecs[:, :k].T
+        self.explained_variance_ = eigvals[:k]
+        self.explained_variance_ratio_ = eigvals[:k] / eigvals.sum()
+        return self
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.mean_) @ self.components_.T
+
+    def fit_transform(self, X, weights):
+        return self.fit(X, weights).transform(X)
+
+
+def _category_codes(series):
+    """類別代碼與類別；類別型欄位保留原本的類別順序"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, levels = pd.factorize(series, sort=True)
+    return codes, list(levels)
+
+
+def weighted_cube(df, cols, weights=None):
+    """
+    加權交叉立方體：各欄位組合的權重總和
+
+    所有欄位先轉為類別代碼，以 ravel_multi_index 合併成單一格子代碼後
+    做一次 bincount；任一欄位缺失的列不計入。
+
+    Returns:
+    --------
+    cube : ndarray
+        形狀為各欄位類別數的加權總和
+    levels : list
+        各欄位的類別
+    """
+    codes, levels = [], []
+    for col in cols:
+        c, lv = _category_codes(df[col])
+        codes.append(c)
+        levels.append(lv)
+
+    shape = tuple(len(lv) for lv in levels)
+    codes = np.stack(codes)
+    valid = (codes >= 0).all(axis=0)
+    w = np.ones(len(df)) if weights is None else np.asarray(weights, dtype=float)
+    cell = np.ravel_multi_index(codes[:, valid], shape)
+    cube = np.bincount(cell, weights=w[valid], minlength=int(np.prod(shape))).reshape(shape)
+    return cube, levels
+
+
+def weighted_percent(df, row, col, weights=None):
+    """加權列百分比交叉表（等同 pd.crosstab(normalize='index') * 100）"""
+    cube, (rows, cols) = weighted_cube(df, [row, col], weights)
+    with np.errstate(invalid='ignore'):
+        pct = cube / cube.sum(axis=1, keepdims=True) * 100
+    table = pd.DataFrame(pct, index=rows, columns=cols)
+    table.index.name, table.columns.name = row, col
+    return table
@@ -0,0 +1,291 @@
+"""
+網路行為分析命令列工具
+
+用法：
+    python cli.py pca [--data PATH] [--no-impute] [--robust {mcd,spatial}]
+                      [--correlation {pearson,polychoric}] [--no-plots]
+    python cli.py diagnostics [--data PATH] [--impute] [--correlation {pearson,polychoric}]
+    python cli.py reliability [--data PATH] [--n-boot N]
+    python cli.py waves --wave ID=PATH [--wave ID=PATH ...] [--rename CSV] [--recode CSV]
+    python cli.py report
+    python cli.py map [--wave ID=PATH ...] [--rename CSV] [--recode CSV] [--output HTML]
+    python cli.py dashboard [--store 目錄] [--port 8050]
+    python cli.py import-budget [--budget 毫秒]
+
+CLI 本身只載入標準函式庫；pandas、scikit-learn、matplotlib、geopandas、
+plotly 等套件都在各子命令內才匯入，快速檢查（例如 KMO）不必付出
+繪圖與機器學習套件的載入成本。
+"""
+import argparse
+import os
+import runpy
+import subprocess
+import sys
+
+MVA_DIR = os.path.dirname(os.path.abspath(__file__))
+PCA_DIR = os.path.join(MVA_DIR, 'PCA')
+DATA_PATH = "/Users/tommy/Desktop/應用多變量分析/processed_data_with_score.csv"
+
+# 啟動 CLI 時不應載入的套件
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'sklearn', 'matplotlib', 'seaborn',
+                 'geopandas', 'plotly', 'factor_analyzer']
+
+# 各子命令第一層匯入的模組、不應因此載入的套件與匯入時間預算（毫秒）
+SUBCOMMAND_IMPORTS = {
+    'pca': (['PCA_loading'], ['plotly', 'geopandas', 'factor_analyzer'], 3000),
+    'diagnostics': (['PCA_testing'], ['sklearn', 'matplotlib', 'seaborn', 'plotly', 'factor_analyzer'], 1000),
+    'reliability': (['PCA_reliability'], ['sklearn', 'matplotlib', 'seaborn', 'plotly', 'factor_analyzer'], 1000),
+    'waves': (['PCA_ingest', 'PCA_waves'], ['plotly', 'geopandas', 'factor_analyzer'], 3000),
+    'map': (['PCA_ingest', 'plot_3Dmap'], ['sklearn', 'matplotlib', 'seaborn', 'factor_analyzer'], 3000),
+    'dashboard': (['PCA_score_store', 'dashboard'], ['sklearn', 'plotly', 'geopandas', 'factor_analyzer'], 1500),
+}
+
+
+def _use_pca_modules():
+    """讓 PCA 目錄下的模組可以直接匯入"""
+    if PCA_DIR not in sys.path:
+        sys.path.insert(0, PCA_DIR)
+
+
+def cmd_pca(args):
+    """執行主成分分析"""
+    _use_pca_modules()
+    from PCA_loading import PCAAnalyzer
+
+    analyzer = PCAAnalyzer(args.data)
+    # 穩健 PCA 需要完整資料
+    analyzer.prepare_data(impute=not (args.no_impute or args.robust))
+    analyzer.do_pca(robust=args.robust is not None, robust_method=args.robust,
+                    correlation=args.correlation)
+    if not args.no_plots:
+        analyzer.plot_scree()
+        analyzer.plot_loadings_heatmap()
+    analyzer.analyze_components()
+
+
+def cmd_diagnostics(args):
+    """樣本適切性、KMO 與 Bartlett 檢定（只需 pandas 與 numpy）"""
+    _use_pca_modules()
+    from PCA_testing import PCATestAnalyzer
+
+    analyzer = PCATestAnalyzer(args.data)
+    analyzer.prepare_data(impute=args.impute, correlation=args.correlation)
+    analyzer.calculate_sample_adequacy()
+    analyzer.perform_kmo_test()
+    analyzer.perform_bartlett_test()
+
+
+def cmd_reliability(args):
+    """量表信度與題目分析（全體與各人口變數子群）"""
+    _use_pca_modules()
+    import pandas as pd
+    from PCA_impute import respondent_frame
+    from PCA_reliability import ReliabilityAnalyzer
+    from PCA_score_store import demographic_frame
+    from PCA_weights import respondent_weights
+
+    df = pd.read_csv(args.data)
+    attitude_groups = {
+        'behavior_obs': [f'q22_0{i}_1' for i in range(1, 6)],
+        'personal_act': [f'q23_0{i}_1' for i in range(1, 6)],
+        'acceptance': [f'q25_0{i}_1' for i in range(1, 5)],
+        'influence': [f'q26_0{i}_1' for i in range(1, 4)]
+    }
+    attitude_cols = [col for group in attitude_groups.values() for col in group]
+
+    analyzer = ReliabilityAnalyzer(respondent_frame(df, attitude_cols), attitude_groups,
+                                   groups=demographic_frame(df), weights=respondent_weights(df))
+    analyzer.run(n_boot=args.n_boot)
+    analyzer.print_summary()
+
+
+def cmd_waves(args):
+    """跨波次 PCA 比較（多個波次檔案同時讀取並對齊至共同編碼簿）"""
+    _use_pca_modules()
+    from PCA_ingest import load_codebook
+    from PCA_waves import main as compare_waves
+
+    wave_paths = dict(item.split('=', 1) for item in args.wave)
+    rename, recode = load_codebook(args.rename, args.recode)
+    compare_waves(wave_paths, rename, recode)
+
+
+def cmd_report(args):
+    """繪製人口變數分布報告"""
+    runpy.run_path(os.path.join(MVA_DIR, 'final_report.py'), run_name='__main__')
+
+
+def cmd_map(args):
+    """繪製台灣 3D 區域地圖；指定多個波次時為動畫地圖"""
+    # 使用者給的路徑以呼叫時的工作目錄為準，切換目錄前先轉為絕對路徑
+    wave_paths = {wave_id: os.path.abspath(path)
+                  for wave_id, path in (item.split('=', 1) for item in args.wave or [])}
+    rename_path, recode_path, output = (os.path.abspath(path) if path else None
+                                        for path in (args.rename, args.recode, args.output))
+
+    # plot_3Dmap.py 以相對路徑讀取 shapefile
+    os.chdir(MVA_DIR)
+    if not wave_paths and not output:
+        runpy.run_path(os.path.join(MVA_DIR, 'plot_3Dmap.py'), run_name='__main__')
+        return
+
+    sys.path.insert(0, MVA_DIR)
+    _use_pca_modules()
+    from PCA_ingest import load_codebook
+    import plot_3Dmap
+
+    rename, recode = load_codebook(rename_path, recode_path)
+    fig = plot_3Dmap.main(wave_paths or plot_3Dmap.WAVE_PATHS, rename, recode)
+    if output:
+        fig.write_html(output, include_plotlyjs='cdn')
+    else:
+        fig.show()
+
+
+def cmd_dashboard(args):
+    """啟動本機互動儀表板"""
+    sys.path.insert(0, MVA_DIR)
+    _use_pca_modules()
+    from PCA_score_store import open_or_build
+    from dashboard import Dashboard, DashboardData
+
+    store = open_or_build(args.data, args.store, n_components=4)
+    Dashboard(DashboardData(store), cache_bytes=args.cache_mb * 1024 * 1024).serve(args.host, args.port)
+
+
+def measure_imports(modules=()):
+    """
+    在子行程中以 -X importtime 匯入 cli 與指定模組
+
+    Returns:
+    --------
+    cumulative_ms : dict
+        各模組的累積匯入時間（毫秒）
+    loaded : set
+        匯入後 sys.modules 中的頂層套件名稱
+    error : str
+        匯入失敗時的錯誤訊息，成功時為 None
+    """
+    statement = 'import sys, cli; cli._use_pca_modules()'
+    for module in modules:
+        statement += f'; import {module}'
+    statement += "; print('\\n'.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=MVA_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {}, set(), result.stderr.strip().splitlines()[-1]
+
+    cumulative_ms = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = [part.strip() for part in line[len('import time:'):].split('|')]
+        if parts[1].isdigit():
+            cumulative_ms[parts[2].strip()] = int(parts[1]) / 1000
+    loaded = {name.split('.')[0] for name in result.stdout.split()}
+    return cumulative_ms, loaded, None
+
+
+def cmd_import_budget(args):
+    """
+    檢查 CLI 與各子命令的匯入時間預算
+
+    cli 本身不得載入任何重型套件；各子命令第一層匯入的模組不得載入
+    SUBCOMMAND_IMPORTS 中列出的套件，且累積匯入時間不超過預算。
+    超出預算或無法匯入時以非零狀態碼結束，可直接放進排程工作中。
+    """
+    print("\nCLI 匯入時間檢查:")
+    print("=" * 50)
+    failed = False
+
+    cumulative_ms, loaded, error = measure_imports()
+    heavy = sorted(loaded & set(HEAVY_MODULES))
+    cli_ms = cumulative_ms.get('cli', 0)
+    print(f"cli 累積匯入時間: {cli_ms:.1f} ms（預算 {args.budget:.0f} ms）")
+    if error or heavy or cli_ms > args.budget:
+        print(f"  未通過: {error or ', '.join(heavy) or '超出預算'}")
+        failed = True
+
+    for command, (modules, forbidden, budget) in SUBCOMMAND_IMPORTS.items():
+        cumulative_ms, loaded, error = measure_imports(modules)
+        if error:
+            # 無法匯入（例如缺少 plotly）視為未通過，避免排程檢查在沒有量測的情況下通過
+            print(f"{command}: 無法匯入（{error}）")
+            print("  未通過: 無法量測")
+            failed = True
+            continue
+        heavy = sorted(loaded & set(forbidden))
+        total_ms = sum(cumulative_ms.get(module, 0) for module in modules)
+        print(f"{command}: {total_ms:.1f} ms（預算 {budget} ms）")
+        if heavy or total_ms > budget:
+            print(f"  未通過: {', '.join(heavy) or '超出預算'}")
+            failed = True
+
+    print("結果: " + ("未通過" if failed else "通過"))
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='網路行為研究分析工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('pca', help='主成分分析')
+    p.add_argument('--data', default=DATA_PATH, help='問卷資料 CSV')
+    p.add_argument('--no-impute', action='store_true', help='改用整列刪除處理缺失值')
+    p.add_argument('--robust', choices=['mcd', 'spatial'], help='穩健 PCA（排除直線作答並標記離群受訪者）')
+    p.add_argument('--correlation', choices=['pearson', 'polychoric'], default='pearson',
+                   help='相關係數種類（polychoric 適用於有序 Likert 題目）')
+    p.add_argument('--no-plots', action='store_true', help='只輸出文字結果')
+    p.set_defaults(func=cmd_pca)
+
+    p = subparsers.add_parser('diagnostics', help='KMO 與 Bartlett 檢定')
+    p.add_argument('--data', default=DATA_PATH, help='問卷資料 CSV')
+    p.add_argument('--impute', action='store_true', help='以多重插補保留所有受訪者')
+    p.add_argument('--correlation', choices=['pearson', 'polychoric'], default='pearson',
+                   help='相關係數種類（polychoric 適用於有序 Likert 題目）')
+    p.set_defaults(func=cmd_diagnostics)
+
+    p = subparsers.add_parser('reliability', help='量表信度與題目分析')
+    p.add_argument('--data', default=DATA_PATH, help='問卷資料 CSV')
+    p.add_argument('--n-boot', type=int, default=1000, help='bootstrap 次數')
+    p.set_defaults(func=cmd_reliability)
+
+    p = subparsers.add_parser('waves', help='跨波次 PCA 比較')
+    p.add_argument('--wave', action='append', required=True, metavar='ID=PATH', help='波次 ID 與資料 CSV（可重複指定）')
+    p.add_argument('--rename', help='欄位更名表 CSV（wave, source, target）')
+    p.add_argument('--recode', help='代碼對照表 CSV（wave, column, source_value, target_value）')
+    p.set_defaults(func=cmd_waves)
+
+    p = subparsers.add_parser('report', help='人口變數分布報告')
+    p.set_defaults(func=cmd_report)
+
+    p = subparsers.add_parser('map', help='台灣 3D 區域地圖')
+    p.add_argument('--wave', action='append', metavar='ID=PATH', help='波次 ID 與資料 CSV（可重複指定，產生動畫地圖）')
+    p.add_argument('--rename', help='欄位更名表 CSV（wave, source, target）')
+    p.add_argument('--recode', help='代碼對照表 CSV（wave, column, source_value, target_value）')
+    p.add_argument('--output', help='另存為 HTML 檔，不開啟瀏覽器')
+    p.set_defaults(func=cmd_map)
+
+    p = subparsers.add_parser('dashboard', help='本機互動儀表板')
+    p.add_argument('--data', default=DATA_PATH, help='問卷資料 CSV（得分存放區不存在時使用）')
+    p.add_argument('--store', default=os.path.join(MVA_DIR, 'pc_score_store'), help='主成分得分存放區目錄')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8050)
+    p.add_argument('--cache-mb', type=int, default=64, help='圖表快取上限（MB）')
+    p.set_defaults(func=cmd_dashboard)
+
+    p = subparsers.add_parser('import-budget', help='檢查 CLI 啟動的匯入時間預算')
+    p.add_argument('--budget', type=float, default=50.0, help='cli 匯入時間上限（毫秒）')
+    p.set_defaults(func=cmd_import_budget)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+"""
+本機互動儀表板（完全離線）
+
+啟動時由主成分得分存放區預先計算彙總量：
+    - 性別 x 地區 x 年齡組別 x 上網時間 的人數立方體（存放區有調查權重時為加權人數）
+    - 每個立方體格子、每個主成分的固定分箱直方圖（箱形圖由此推得分位數）
+    - 每個格子的隨機子樣本（散點圖用）
+任何篩選組合都只需加總立方體的切片，不必重新讀取資料或重做 PCA。
+繪好的圖以篩選參數為鍵存入有大小上限的 LRU 快取；伺服器以多執行緒
+處理請求，繪圖在獨立的執行緒中排隊，已快取的請求不會被慢速繪圖阻塞。
+
+用法：
+    python dashboard.py [--store pc_score_store] [--port 8050]
+"""
+import io
+import os
+import sys
+import json
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PCA'))
+from PCA_score_store import PCScoreStore, DEFAULT_STORE_DIR
+
+# 設置中文字型
+matplotlib.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Microsoft JhengHei', 'Apple LiGothic Medium']
+matplotlib.rcParams['axes.unicode_minus'] = False
+
+DIMENSIONS = ['gender_label', 'region', 'age_group', 'internet_usage']
+DIMENSION_LABELS = {'gender_label': '性別', 'region': '地區', 'age_group': '出生民國年組別',
+                    'internet_usage': '每日上網時間'}
+# 缺失值自成一類，受訪者不會因為某一維度未填答而從所有彙總中消失
+MISSING_LABEL = '未填'
+
+
+class FigureCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """以位元組數為上限的 LRU 快取"""
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.items:
+                self.size -= len(self.items.pop(key)[1])
+            self.items[key] = value
+            self.size += len(value[1])
+            while self.size > self.max_bytes and len(self.items) > 1:
+                _, (_, body) = self.items.popitem(last=False)
+                self.size -= len(body)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.items), 'bytes': self.size,
+                    'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class DashboardData:
+    def __init__(self, store, n_bins=200, scatter_per_cell=300, seed=0):
+        """
+        由得分存放區預先計算儀表板所需的彙總量
+
+        Parameters:
+        -----------
+        store : PCScoreStore
+            主成分得分存放區
+        n_bins : int
+            每個主成分直方圖的分箱數
+        scatter_per_cell : int
+            每個立方體格子保留的散點數
+        """
+        self.pcs = store.columns
+        # 存放區沒有的維度（例如資料沒有 q7）視為只有「全部」一個類別；
+        # 有缺失值的維度另加 MISSING_LABEL 類別
+        n = store.meta['n_rows']
+        self.levels = {}
+        codes = []
+        for dim in DIMENSIONS:
+            levels = list(store.meta['demographics'].get(dim, ['全部']))
+            dim_codes = np.asarray(store.codes[dim]) if dim in store.codes else np.zeros(n, dtype=np.int8)
+            if (dim_codes < 0).any():
+                dim_codes = np.where(dim_codes < 0, len(levels), dim_codes)
+                levels.append(MISSING_LABEL)
+            self.levels[dim] = levels
+            codes.append(dim_codes)
+        codes = np.stack(codes)
+        shape = tuple(len(self.levels[dim]) for dim in DIMENSIONS)
+
+        cell = np.ravel_multi_index(codes, shape)
+        n_cells = int(np.prod(shape))
+        scores = np.asarray(store.scores)
+        weights = None if store.weights is None else np.asarray(store.weights, dtype=float)
+        self.weighted = weights is not None
+
+        # 人數立方體
+        self.counts = np.bincount(cell, weights=weights, minlength=n_cells).reshape(shape)
+
+        # 每格每個主成分的直方圖
+        self.edges = {}
+        self.hists = {}
+        for j, pc in enumerate(self.pcs):
+            edges = np.linspace(scores[:, j].min(), scores[:, j].max(), n_bins + 1)
+            bins = np.clip(np.searchsorted(edges, scores[:, j], side='right') - 1, 0, n_bins - 1)
+            hist = np.bincount(cell * n_bins + bins, weights=weights, minlength=n_cells * n_bins)
+            self.edges[pc] = edges
+            self.hists[pc] = hist.reshape(shape + (n_bins,))
+
+        # 每格的隨機子樣本：以亂數排序後取各格前 scatter_per_cell 列
+        rng = np.random.default_rng(seed)
+        order = np.lexsort((rng.random(len(cell)), cell))
+        first = np.searchsorted(cell[order], cell[order], side='left')
+        keep = order[np.arange(len(order)) - first < scatter_per_cell]
+        self.scatter_scores = scores[keep]
+        self.scatter_codes = codes[:, keep]
+
+    def selection(self, filters):
+        """將篩選條件轉為各維度的布林遮罩"""
+        masks = []
+        for dim in DIMENSIONS:
+            mask = np.ones(len(self.levels[dim]), dtype=bool)
+            if filters.get(dim):
+                mask = np.isin(self.levels[dim], filters[dim])
+            masks.append(mask)
+        return masks
+
+    def _reduce(self, cube, filters, by=None):
+        """篩選立方體並加總到 by 維度（以及直方圖等尾端維度）"""
+        masks = self.selection(filters)
+        sub = cube[np.ix_(*masks)] if cube.ndim == len(DIMENSIONS) else \
+            cube[np.ix_(*masks, np.arange(cube.shape[-1]))]
+        keep_axes = [DIMENSIONS.index(b) for b in (by or [])]
+        axes = tuple(i for i in range(len(DIMENSIONS)) if i not in keep_axes)
+        labels = [list(np.array(self.levels[DIMENSIONS[i]])[masks[i]]) for i in keep_axes]
+        reduced = sub.sum(axis=axes)
+        # 保留的維度依 by 的順序排列
+        order = [sorted(keep_axes).index(i) for i in keep_axes]
+        return reduced.transpose(order + list(range(len(order), reduced.ndim))), labels
+
+    def distribution(self, by, filters):
+        """依 by 維度的人數"""
+        counts, labels = self._reduce(self.counts, filters, [by])
+        return labels[0], counts
+
+    def box_stats(self, pc, by, filters):
+        """由直方圖推得各組的箱形圖統計量（分位數以分箱內插）"""
+        hists, labels = self._reduce(self.hists[pc], filters, [by])
+        edges = self.edges[pc]
+        stats = []
+        for label, hist in zip(labels[0], hists):
+            total = hist.sum()
+            if total == 0:
+                continue
+            cdf = np.concatenate([[0], np.cumsum(hist)]) / total
+            q = lambda p: float(np.interp(p, cdf, edges))
+            q1, med, q3 = q(0.25), q(0.5), q(0.75)
+            nonzero = np.flatnonzero(hist)
+            lo, hi = edges[nonzero[0]], edges[nonzero[-1] + 1]
+            iqr = q3 - q1
+            stats.append({'label': label, 'med': med, 'q1': q1, 'q3': q3,
+                          'whislo': max(lo, q1 - 1.5 * iqr), 'whishi': min(hi, q3 + 1.5 * iqr),
+                          'fliers': []})
+        return stats
+
+    def scatter(self, pc_x, pc_y, filters):
+        """篩選後的散點子樣本"""
+        masks = self.selection(filters)
+        keep = np.ones(self.scatter_scores.shape[0], dtype=bool)
+        for i, mask in enumerate(masks):
+            keep &= mask[self.scatter_codes[i]]
+        x = self.scatter_scores[keep, self.pcs.index(pc_x)]
+        y = self.scatter_scores[keep, self.pcs.index(pc_y)]
+        return x, y, self.scatter_codes[0, keep]
+
+
+def _png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_distribution(data, params, filters):
+    by = params.get('by', 'region')
+    labels, counts = data.distribution(by, filters)
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.bar(labels, counts, color='#FF69B4')
+    for i, c in enumerate(counts):
+        ax.text(i, c, f'{c / max(counts.sum(), 1):.1%}', ha='center', va='bottom')
+    ax.set_title(f'{DIMENSION_LABELS[by]} 分布（n = {counts.sum():.0f}）')
+    ax.set_ylabel('加權人數' if data.weighted else '人數')
+    return _png(fig)
+
+
+def render_boxplot(data, params, filters):
+    pc = params.get('pc', data.pcs[0])
+    by = params.get('by', 'region')
+    stats = data.box_stats(pc, by, filters)
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    if stats:
+        ax.bxp(stats, showfliers=False)
+    ax.set_title(f'{pc} 得分分布')
+    ax.set_xlabel(DIMENSION_LABELS[by])
+    ax.set_ylabel('主成分得分')
+    return _png(fig)
+
+
+def render_scatter(data, params, filters):
+    pc_x = params.get('x', data.pcs[0])
+    pc_y = params.get('y', data.pcs[1])
+    x, y, gender = data.scatter(pc_x, pc_y, filters)
+    colors = {'男性': '#66B2FF', '女性': '#FF9999'}
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    for code, label in enumerate(data.levels['gender_label']):
+        mask = gender == code
+        ax.scatter(x[mask], y[mask], c=colors.get(label, 'gray'), alpha=0.6, label=label)
+    ax.set_xlabel(pc_x)
+    ax.set_ylabel(pc_y)
+    ax.set_title(f'{pc_x} vs {pc_y} 主成分得分散點圖')
+    ax.legend(title='性別')
+    ax.grid(True, linestyle='--', alpha=0.7)
+    return _png(fig)
+
+
+@functools.lru_cache(maxsize=1)
+def _taiwan_map():
+    """底圖只讀取一次"""
+    import plot_3Dmap
+    return plot_3Dmap.load_taiwan_map(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'taiwan_map/COUNTY_MOI_1130718.shp'))
+
+
+def render_map(data, params, filters):
+    """
+    3D 區域地圖：男性比例與上網時間分布由篩選後的人數立方體計算
+
+    plotly.js 不內嵌於每份回應，而是由 /plotly.min.js 提供（瀏覽器只下載一次）。
+    """
+    import plot_3Dmap
+
+    def percent(counts, labels):
+        # 百分比只以有填答的受訪者為分母
+        answered = [i for i, label in enumerate(labels) if label != MISSING_LABEL]
+        counts = counts[:, answered]
+        with np.errstate(invalid='ignore'):
+            return np.nan_to_num(counts / counts.sum(axis=1, keepdims=True) * 100 / 3), \
+                [labels[i] for i in answered]
+
+    gender_counts, (regions, genders) = data._reduce(data.counts, filters, ['region', 'gender_label'])
+    usage_counts, (_, usages) = data._reduce(data.counts, filters, ['region', 'internet_usage'])
+    gender_pct, genders = percent(gender_counts, genders)
+    usage_pct, usages = percent(usage_counts, usages)
+    gender_rows = {r: dict(zip(genders, gender_pct[i])) for i, r in enumerate(regions)}
+    usage_rows = {r: dict(zip(usages, usage_pct[i])) for i, r in enumerate(regions)}
+    gender_data = {r: {'男性': gender_rows.get(r, {}).get('男性', 0.0)} for r in plot_3Dmap.regions}
+    usage_data = {r: {h: usage_rows.get(r, {}).get(h, 0.0) for h in ['0-3h', '3-6h', '6h+']}
+                  for r in plot_3Dmap.regions}
+
+    fig = plot_3Dmap.build_figure(_taiwan_map(), gender_data, usage_data)
+    return fig.to_html(include_plotlyjs='/plotly.min.js', full_html=True).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=1)
+def plotly_js():
+    """plotly.js 原始碼（離線使用，伺服器只讀取一次）"""
+    from plotly.offline import get_plotlyjs
+    return get_plotlyjs().encode('utf-8')
+
+
+RENDERERS = {
+    '/distribution.png': ('image/png', render_distribution),
+    '/boxplot.png': ('image/png', render_boxplot),
+    '/scatter.png': ('image/png', render_scatter),
+    '/map.html': ('text/html; charset=utf-8', render_map),
+}
+
+
+INDEX_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>網路行為研究儀表板</title></head>
+<body>
+<h2>網路行為研究儀表板</h2>
+<form id="filters">
+  性別 <select name="gender_label"><option value="">全部</option>{gender_label}</select>
+  地區 <select name="region"><option value="">全部</option>{region}</select>
+  年齡組別 <select name="age_group"><option value="">全部</option>{age_group}</select>
+  上網時間 <select name="internet_usage"><option value="">全部</option>{internet_usage}</select>
+  主成分 <select name="pc">{pcs}</select>
+  分組 <select name="by"><option value="region">地區</option><option value="age_group">年齡組別</option>
+  <option value="gender_label">性別</option><option value="internet_usage">上網時間</option></select>
+</form>
+<div>
+  <img id="distribution"><img id="boxplot"><img id="scatter">
+</div>
+<p><a id="map" href="/map.html">3D 區域地圖</a> | <a href="/stats">快取狀態</a></p>
+<script>
+function refresh() {{
+  const params = new URLSearchParams(new FormData(document.getElementById('filters')));
+  for (const [k, v] of [...params.entries()]) if (!v) params.delete(k);
+  const q = params.toString();
+  document.getElementById('distribution').src = '/distribution.png?' + q;
+  document.getElementById('boxplot').src = '/boxplot.png?' + q;
+  document.getElementById('scatter').src = '/scatter.png?' + q;
+  document.getElementById('map').href = '/map.html?' + q;
+}}
+document.getElementById('filters').addEventListener('change', refresh);
+refresh();
+</script>
+</body></html>
+"""
+
+
+class Dashboard:
+    def __init__(self, data, cache_bytes=64 * 1024 * 1024, render_workers=1):
+        """
+        儀表板服務
+
+        繪圖交給獨立的執行緒池（預設單一執行緒，避免 matplotlib 的全域狀態
+        互相干擾），相同參數的請求共用同一個進行中的繪圖工作。
+        """
+        self.data = data
+        self.cache = FigureCache(cache_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=render_workers)
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def index(self):
+        options = {
+            dim: ''.join(f'<option>{v}</option>' for v in self.data.levels[dim])
+            for dim in DIMENSIONS
+        }
+        pcs = ''.join(f'<option>{pc}</option>' for pc in self.data.pcs)
+        return INDEX_HTML.format(pcs=pcs, **options).encode('utf-8')
+
+    def render(self, path, params):
+        """回傳 (content_type, body)，優先從快取取得"""
+        filters = {dim: params[dim] for dim in DIMENSIONS if dim in params}
+        flat = {k: v[0] for k, v in params.items() if k not in DIMENSIONS}
+        key = (path, tuple(sorted((k, tuple(sorted(v))) for k, v in params.items())))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        content_type, renderer = RENDERERS[path]
+        with self.pending_lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.executor.submit(renderer, self.data, flat, filters)
+                self.pending[key] = future
+        try:
+            result = (content_type, future.result())
+        finally:
+            with self.pending_lock:
+                self.pending.pop(key, None)
+        self.cache.put(key, result)
+        return result
+
+    def handler(self):
+        dashboard = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v for k, v in parse_qs(url.query).items() if v and v[0]}
+                try:
+                    if url.path == '/':
+                        content_type, body = 'text/html; charset=utf-8', dashboard.index()
+                    elif url.path == '/plotly.min.js':
+                        content_type, body = 'application/javascript', plotly_js()
+                    elif url.path == '/stats':
+                        content_type = 'application/json'
+                        body = json.dumps(dashboard.cache.stats()).encode('utf-8')
+                    elif url.path in RENDERERS:
+                        content_type, body = dashboard.render(url.path, params)
+                    else:
+                        self.send_error(404)
+                        return
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                if url.path == '/plotly.min.js':
+                    self.send_header('Cache-Control', 'public, max-age=86400')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host='127.0.0.1', port=8050):
+        server = ThreadingHTTPServer((host, port), self.handler())
+        print(f"儀表板已啟動：http://{host}:{port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.executor.shutdown()
+
+
+def main(store_dir=DEFAULT_STORE_DIR, host='127.0.0.1', port=8050):
+    store = PCScoreStore.open(store_dir)
+    data = DashboardData(store)
+    Dashboard(data).serve(host, port)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='網路行為研究儀表板')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='主成分得分存放區目錄')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    args = parser.parse_args()
+    main(args.store, args.host, args.port)
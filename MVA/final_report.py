@@ -1,17 +1,20 @@
+import os
+import sys
 import pandas as pd
-import seaborn as sns
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PCA'))
+from PCA_approx import stratified_reservoir, design_weights, weighted_crosstab
+from PCA_weights import WEIGHT_COL, weighted_percent
+from PCA_ingest import EXPORT_CODEBOOK, decode_demographics
+
 # 設置字體大小
 plt.rcParams.update({'font.size': 14, 'axes.titlesize': 18, 'axes.labelsize': 16, 'xtick.labelsize': 14, 'ytick.labelsize': 14, 'legend.fontsize': 14})
 
-# 讀取CSV檔案到DataFrame
-df = pd.read_csv('/Users/lishengfeng/Desktop/多變量分析/newselect_onehot(1).csv')
-
-# 替換欄位值
-df['q1'] = df['q1'].replace({0: 'female', 1: 'man'})
-df['q3'] = df['q3'].replace({1: 'North', 2: 'Central', 3: 'South', 4: 'East', 5: 'Islands', 6: 'Others'})
-df['q7'] = df['q7'].replace({1: '0-3 hrs', 2: '3-6 hrs', 3: 'over 6 hrs'})
+# 近似模式：大型合併樣本做探索性分析時，以地區 x 出生年代的分層水庫樣本
+# 取代完整讀取，百分比附 bootstrap 信賴區間；正式結果請維持 False
+APPROXIMATE = False
+DATA_PATH = '/Users/lishengfeng/Desktop/多變量分析/newselect_onehot(1).csv'
 
 def categorize_birth_year(year):
     if year <= 60:
@@ -25,22 +28,45 @@ def categorize_birth_year(year):
     else:
         return 'After 90'
 
-df['Birth_Category'] = df['q2'].apply(categorize_birth_year)
+def add_birth_category(chunk):
+    return chunk.assign(Birth_Category=chunk['q2'].apply(categorize_birth_year))
 
-# 重命名欄位
-df.rename(columns={
-    'q1': 'Gender',
-    'q3': 'Area',
-    'q2': 'Birth_Year',
-    'q7': 'Net_Time'
-}, inplace=True)
+# 讀取CSV檔案到DataFrame
+# 資料含調查權重欄位時，所有百分比預設加權（近似模式下再乘上分層設計權重）
+if APPROXIMATE:
+    df, strata_counts = stratified_reservoir(DATA_PATH, ['q3', 'Birth_Category'], derive=add_birth_category)
+    df['_weight'] = design_weights(df, strata_counts)
+else:
+    df = add_birth_category(pd.read_csv(DATA_PATH))
+    df['_weight'] = 1.0
+survey_weights = df[WEIGHT_COL].astype(float) if WEIGHT_COL in df.columns else None
+if survey_weights is not None:
+    df['_weight'] *= survey_weights
+
+# 依匯出檔編碼簿解碼性別、地區與上網時間（見 PCA_ingest.EXPORT_CODEBOOK）
+df = df.join(decode_demographics(df, EXPORT_CODEBOOK))
+df.rename(columns={'q2': 'Birth_Year'}, inplace=True)
+
+def weighted_counts(col):
+    """各類別的（加權）人數，依人數由多到少排序"""
+    return df.groupby(col, observed=True)['_weight'].sum().sort_values(ascending=False)
+
+def area_crosstab(col):
+    """各地區的（加權）列百分比；近似模式下由分層樣本加權估計並列印信賴區間"""
+    if not APPROXIMATE:
+        return weighted_percent(df, 'Area', col, df['_weight']).dropna(how='all')
+    
+    pct, lower, upper = weighted_crosstab(df, 'Area', col, strata_counts, weights=survey_weights)
+    print(f"\n{col} 依地區的近似百分比（95% bootstrap 信賴區間）:")
+    print(pct.round(1).astype(str) + ' [' + lower.round(1).astype(str) + ', ' + upper.round(1).astype(str) + ']')
+    return pct
 
 # 定義調色盤
 light_to_dark_palette = ['#FFC0CB', '#FF99CC', '#FF69B4', '#FF1493', '#DB7093', '#C71585', '#8B0000']
 
 # 創建性別分布圓餅圖
 plt.figure(figsize=(8, 8))
-gender_counts = df['Gender'].value_counts()
+gender_counts = weighted_counts('Gender')
 plt.pie(gender_counts, labels=gender_counts.index, autopct='%1.1f%%', startangle=140, colors=light_to_dark_palette[:2])
 plt.title('Gender Distribution')
 plt.axis('equal')
@@ -50,7 +76,7 @@ plt.show()
 
 # 創建出生年份區間分布圓餅圖
 plt.figure(figsize=(8, 8))
-birth_counts = df['Birth_Category'].value_counts().reindex(['Before 60', '61-70', '71-80', '81-90', 'After 90'])
+birth_counts = weighted_counts('Birth_Category').reindex(['Before 60', '61-70', '71-80', '81-90', 'After 90'])
 plt.pie(birth_counts, labels=birth_counts.index, autopct='%1.1f%%', startangle=140, colors=light_to_dark_palette[:5])
 plt.title('Birth Year Distribution')
 plt.axis('equal')
@@ -60,7 +86,7 @@ plt.show()
 
 # 創建地區分布圓餅圖
 plt.figure(figsize=(8, 8))
-area_counts = df['Area'].value_counts()
+area_counts = weighted_counts('Area')
 plt.pie(area_counts, labels=area_counts.index, autopct='%1.1f%%', startangle=140, colors=light_to_dark_palette)
 plt.title('Area Distribution')
 plt.axis('equal')
@@ -70,7 +96,7 @@ plt.show()
 
 # 創建網路使用時間分布圓餅圖
 plt.figure(figsize=(8, 8))
-net_time_counts = df['Net_Time'].value_counts()
+net_time_counts = weighted_counts('Net_Time')
 plt.pie(net_time_counts, labels=net_time_counts.index, autopct='%1.1f%%', startangle=140, colors=light_to_dark_palette[:3])
 plt.title('Net Time Distribution')
 plt.axis('equal')
@@ -85,18 +111,18 @@ def plot_gender_distribution():
     plt.figure(figsize=(12, 6))
     
     # 計算百分比
-    gender_area = pd.crosstab(df['Area'], df['Gender'], normalize='index') * 100
+    gender_area = area_crosstab('Gender')
     
     # 繪製堆疊條形圖
     ax = gender_area.plot(kind='bar', stacked=True, color=['#FFC0CB', '#FF69B4'])
     
     # 添加百分比標籤
     for i in range(len(gender_area.index)):
-        female_pct = gender_area.iloc[i, 0]
-        male_pct = gender_area.iloc[i, 1]
-        
-        ax.text(i, female_pct/2, f'{female_pct:.1f}%', ha='center', va='center')
-        ax.text(i, female_pct + male_pct/2, f'{male_pct:.1f}%', ha='center', va='center')
+        yoff = 0
+        for j in range(len(gender_area.columns)):
+            value = gender_area.iloc[i, j]
+            ax.text(i, yoff + value/2, f'{value:.1f}%', ha='center', va='center')
+            yoff += value
     
     plt.title('Gender Distribution by Area')
     plt.xlabel('Area')
@@ -110,7 +136,7 @@ def plot_birth_distribution():
     plt.figure(figsize=(12, 6))
     
     # 計算百分比
-    birth_area = pd.crosstab(df['Area'], df['Birth_Category'], normalize='index') * 100
+    birth_area = area_crosstab('Birth_Category')
     birth_area = birth_area[['Before 60', '61-70', '71-80', '81-90', 'After 90']]
     
     # 繪製堆疊條形圖
@@ -138,7 +164,7 @@ def plot_nettime_distribution():
     plt.figure(figsize=(12, 6))
     
     # 計算百分比
-    net_area = pd.crosstab(df['Area'], df['Net_Time'], normalize='index') * 100
+    net_area = area_crosstab('Net_Time')
     
     # 繪製堆疊條形圖
     ax = net_area.plot(kind='bar', stacked=True, 
@@ -1,13 +1,19 @@
+import os
+import sys
 import plotly.graph_objects as go
 import geopandas as gpd
 import numpy as np
-from plotly.subplots import make_subplots
+import pandas as pd
 
-# 讀取台灣地圖 shapefile
-taiwan_map = gpd.read_file('taiwan_map/COUNTY_MOI_1130718.shp')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PCA'))
+from PCA_weights import WEIGHT_COL, weighted_cube
+from PCA_ingest import ingest_waves, decode_demographics
 
-# 確保座標系統為 WGS84
-taiwan_map = taiwan_map.to_crs('EPSG:4326')
+# 設為問卷資料 CSV 時，改由資料重新計算各區百分比（有權重欄位時加權）
+DATA_PATH = None
+
+# 設為 {波次 ID: CSV 路徑} 時，改為各波次一個畫格的動畫地圖
+WAVE_PATHS = None
 
 # 定義台灣各區域的中心點座標
 regions = ['北部', '中部', '南部', '東部']
@@ -20,10 +26,10 @@ region_coords = {
 
 # 準備資料 - 將數值縮小為原來的1/3
 gender_data = {
-    '北部': {'男': 64.7/3, '女': 35.3/3},
-    '中部': {'男': 55.9/3, '女': 44.1/3},
-    '南部': {'男': 61.4/3, '女': 38.6/3},
-    '東部': {'男': 68.6/3, '女': 31.4/3}
+    '北部': {'男性': 64.7/3, '女性': 35.3/3},
+    '中部': {'男性': 55.9/3, '女性': 44.1/3},
+    '南部': {'男性': 61.4/3, '女性': 38.6/3},
+    '東部': {'男性': 68.6/3, '女性': 31.4/3}
 }
 
 internet_usage = {
@@ -33,90 +39,221 @@ internet_usage = {
     '東部': {'0-3h': 54.3/3, '3-6h': 34.3/3, '6h+': 11.4/3}
 }
 
-# 創建主圖表
-fig = go.Figure()
+def _percentage_cube(df, by=(), weight_col=WEIGHT_COL, scale=1/3):
+    """
+    以一次加權 bincount 建立 (by...) x 地區 x 性別 x 上網時間 的立方體，
+    再各自加總到男女比例與上網時間兩個邊際表（百分比，乘上 scale）
 
-# 添加台灣地圖底圖
-for idx, row in taiwan_map.iterrows():
-    if row.geometry.geom_type == 'MultiPolygon':
-        for geom in row.geometry.geoms:
-            x, y = geom.exterior.xy
-            fig.add_trace(go.Scatter3d(
-                x=list(x),
-                y=list(y),
-                z=[0]*len(x),
-                mode='lines',
-                line=dict(color='gray', width=2),  # 增加線條寬度
-                showlegend=False
-            ))
-    else:
-        x, y = row.geometry.exterior.xy
-        fig.add_trace(go.Scatter3d(
-            x=list(x),
-            y=list(y),
-            z=[0]*len(x),
-            mode='lines',
-            line=dict(color='gray', width=2),  # 增加線條寬度
-            showlegend=False
-        ))
+    Returns:
+    --------
+    gender_pct : ndarray, shape (..., 地區, 2)
+    usage_pct : ndarray, shape (..., 地區, 3)
+    levels : list
+        各欄位的類別（by 欄位在前）
+    """
+    decoded = decode_demographics(df)
+    data = pd.DataFrame({col: df[col].array for col in by})
+    data['region'] = decoded['region'].cat.set_categories(regions).array
+    data['gender'] = decoded['gender_label'].array
+    data['usage'] = decoded['internet_usage'].array
+    weights = df[weight_col].to_numpy(dtype=float) if weight_col in df.columns else None
+    cube, levels = weighted_cube(data, list(by) + ['region', 'gender', 'usage'], weights)
+
+    def percent(table):
+        with np.errstate(invalid='ignore'):
+            return table / table.sum(axis=-1, keepdims=True) * 100 * scale
+
+    return percent(cube.sum(axis=-1)), percent(cube.sum(axis=-2)), levels
+
+def regional_percentages(df, weight_col=WEIGHT_COL, scale=1/3):
+    """由問卷資料計算各區域的男性比例與上網時間分布（百分比，乘上 scale）"""
+    gender_pct, usage_pct, (region_levels, gender_levels, usage_levels) = \
+        _percentage_cube(df, weight_col=weight_col, scale=scale)
+    gender = {r: dict(zip(gender_levels, gender_pct[i])) for i, r in enumerate(region_levels)}
+    usage = {r: dict(zip(usage_levels, usage_pct[i])) for i, r in enumerate(region_levels)}
+    return gender, usage
 
-# 為每個區域添加數據柱
-for region in regions:
-    # 性別分布
+def wave_percentages(df, wave_col='wave', weight_col=WEIGHT_COL, scale=1/3):
+    """
+    所有波次的各區百分比，一次聚合完成（見 _percentage_cube）
+
+    Returns:
+    --------
+    waves : list
+        波次 ID
+    gender_pct : ndarray, shape (波次, 地區, 2)
+    usage_pct : ndarray, shape (波次, 地區, 3)
+    """
+    gender_pct, usage_pct, levels = _percentage_cube(df, [wave_col], weight_col, scale)
+    return levels[0], gender_pct, usage_pct
+
+def load_taiwan_map(path='taiwan_map/COUNTY_MOI_1130718.shp'):
+    """讀取台灣地圖 shapefile 並轉為 WGS84"""
+    taiwan_map = gpd.read_file(path)
+    
+    # 確保座標系統為 WGS84
+    return taiwan_map.to_crs('EPSG:4326')
+
+def add_base_map(fig, taiwan_map):
+    """
+    添加台灣地圖底圖
+
+    所有縣市外框合併為單一線條 trace（以 None 分隔各多邊形），
+    因此數據柱的 trace 編號固定，動畫畫格只需參照數據柱。
+    """
+    xs, ys = [], []
+    for geometry in taiwan_map.geometry:
+        polygons = geometry.geoms if geometry.geom_type == 'MultiPolygon' else [geometry]
+        for geom in polygons:
+            x, y = geom.exterior.xy
+            xs.extend(list(x) + [None])
+            ys.extend(list(y) + [None])
     fig.add_trace(go.Scatter3d(
-        x=[region_coords[region]['lon'], region_coords[region]['lon']],
-        y=[region_coords[region]['lat'], region_coords[region]['lat']],
-        z=[0, gender_data[region]['男']],
+        x=xs,
+        y=ys,
+        z=[0 if x is not None else None for x in xs],
         mode='lines',
-        line=dict(color='blue', width=8),  # 增加柱狀圖寬度
-        name=f'{region}-男性比例'
+        line=dict(color='gray', width=2),  # 增加線條寬度
+        showlegend=False,
+        hoverinfo='skip'
     ))
-    
-    # 網路使用時間
-    z_values = [internet_usage[region]['0-3h'],
-                internet_usage[region]['3-6h'],
-                internet_usage[region]['6h+']]
-    
-    for i, z in enumerate(z_values):
-        fig.add_trace(go.Scatter3d(
-            x=[region_coords[region]['lon'] + 0.15],  # 增加間距
-            y=[region_coords[region]['lat'] + 0.15 * i],
-            z=[0, z],
+
+def bar_traces(gender_values, usage_values):
+    """
+    各區域的數據柱（每區 1 根男性比例與 3 根上網時間）
+
+    Parameters:
+    -----------
+    gender_values : array-like, shape (地區,)
+        各區男性比例
+    usage_values : array-like, shape (地區, 3)
+        各區 0-3h / 3-6h / 6h+ 比例
+    """
+    traces = []
+    for r, region in enumerate(regions):
+        lon, lat = region_coords[region]['lon'], region_coords[region]['lat']
+        # 性別分布
+        traces.append(go.Scatter3d(
+            x=[lon, lon],
+            y=[lat, lat],
+            z=[0, round(float(gender_values[r]), 2)],
             mode='lines',
-            line=dict(
-                color=['lightgreen', 'green', 'darkgreen'][i],
-                width=8  # 增加柱狀圖寬度
-            ),
-            name=f'{region}-網路使用{["0-3h", "3-6h", "6h+"][i]}'
+            line=dict(color='blue', width=8),  # 增加柱狀圖寬度
+            name=f'{region}-男性比例'
         ))
+        
+        # 網路使用時間
+        for i, label in enumerate(['0-3h', '3-6h', '6h+']):
+            traces.append(go.Scatter3d(
+                x=[lon + 0.15, lon + 0.15],  # 增加間距
+                y=[lat + 0.15 * i, lat + 0.15 * i],
+                z=[0, round(float(usage_values[r][i]), 2)],
+                mode='lines',
+                line=dict(
+                    color=['lightgreen', 'green', 'darkgreen'][i],
+                    width=8  # 增加柱狀圖寬度
+                ),
+                name=f'{region}-網路使用{label}'
+            ))
+    return traces
+
+def add_region_bars(fig, gender_data, internet_usage):
+    """為每個區域添加數據柱"""
+    gender_values = [gender_data[region]['男性'] for region in regions]
+    usage_values = [[internet_usage[region][h] for h in ['0-3h', '3-6h', '6h+']] for region in regions]
+    fig.add_traces(bar_traces(gender_values, usage_values))
 
-# 更新布局
-fig.update_layout(
-    title='台灣各區域人口特徵與網路使用分析',
-    scene = dict(
-        xaxis_title='經度',
-        yaxis_title='緯度',
-        zaxis_title='百分比',
-        camera=dict(
-            up=dict(x=0, y=0, z=1),
-            center=dict(x=0, y=0, z=0),
-            eye=dict(x=0.5, y=0.5, z=1.5)  # 調整視角使地圖看起來更大
+def style_figure(fig):
+    """更新布局並添加註解說明"""
+    fig.update_layout(
+        title='台灣各區域人口特徵與網路使用分析',
+        scene = dict(
+            xaxis_title='經度',
+            yaxis_title='緯度',
+            zaxis_title='百分比',
+            camera=dict(
+                up=dict(x=0, y=0, z=1),
+                center=dict(x=0, y=0, z=0),
+                eye=dict(x=0.5, y=0.5, z=1.5)  # 調整視角使地圖看起來更大
+            ),
+            aspectmode='cube',  # 改用立方體模式以調整比例
+            aspectratio=dict(x=2, y=2, z=1)  # 調整xyz軸的比例
         ),
-        aspectmode='cube',  # 改用立方體模式以調整比例
-        aspectratio=dict(x=2, y=2, z=1)  # 調整xyz軸的比例
-    ),
-    height=1000,  # 增加圖表高度
-    width=1200,   # 增加圖表寬度
-    showlegend=True
-)
-
-# 添加註解說明
-fig.add_annotation(
-    text='藍色: 男性比例 | 綠色漸層: 網路使用時間分布',
-    xref='paper', yref='paper',
-    x=0, y=1.1,
-    showarrow=False,
-    font=dict(size=14)  # 增加字體大小
-)
-
-fig.show()
\ No newline at end of file
+        height=1000,  # 增加圖表高度
+        width=1200,   # 增加圖表寬度
+        showlegend=True
+    )
+    
+    fig.add_annotation(
+        text='藍色: 男性比例 | 綠色漸層: 網路使用時間分布',
+        xref='paper', yref='paper',
+        x=0, y=1.1,
+        showarrow=False,
+        font=dict(size=14)  # 增加字體大小
+    )
+
+def build_figure(taiwan_map, gender_data=gender_data, internet_usage=internet_usage):
+    """組合底圖、數據柱與版面"""
+    fig = go.Figure()
+    add_base_map(fig, taiwan_map)
+    add_region_bars(fig, gender_data, internet_usage)
+    style_figure(fig)
+    return fig
+
+def build_animated_figure(taiwan_map, waves, gender_pct, usage_pct):
+    """
+    多波次動畫地圖（播放鍵與滑桿切換波次）
+
+    底圖只在初始資料中出現一次；每個畫格以 traces 參照數據柱的編號，
+    只帶數據柱的座標，輸出的 HTML 大小因此接近單一畫格的版本。
+
+    Parameters:
+    -----------
+    waves : list
+        波次 ID
+    gender_pct, usage_pct : ndarray
+        wave_percentages 的結果
+    """
+    fig = go.Figure()
+    add_base_map(fig, taiwan_map)
+    n_base = len(fig.data)
+    fig.add_traces(bar_traces(gender_pct[0, :, 0], usage_pct[0]))
+    bar_index = list(range(n_base, len(fig.data)))
+
+    fig.frames = [
+        go.Frame(data=bar_traces(gender_pct[w, :, 0], usage_pct[w]), traces=bar_index, name=str(wave))
+        for w, wave in enumerate(waves)
+    ]
+    style_figure(fig)
+
+    # 固定 z 軸範圍，避免切換波次時座標軸跳動
+    z_max = np.nanmax([np.nanmax(gender_pct[..., 0]), np.nanmax(usage_pct)])
+    animation = dict(frame=dict(duration=800, redraw=True), transition=dict(duration=0), mode='immediate')
+    fig.update_layout(
+        scene_zaxis_range=[0, z_max * 1.1],
+        updatemenus=[dict(
+            type='buttons', showactive=False, x=0, y=0, xanchor='left', yanchor='top',
+            buttons=[
+                dict(label='播放', method='animate', args=[None, dict(animation, fromcurrent=True)]),
+                dict(label='暫停', method='animate', args=[[None], dict(animation, frame=dict(duration=0, redraw=False))]),
+            ]
+        )],
+        sliders=[dict(
+            active=0, x=0.1, len=0.9, currentvalue=dict(prefix='波次: '),
+            steps=[dict(label=str(wave), method='animate', args=[[str(wave)], animation]) for wave in waves]
+        )]
+    )
+    return fig
+
+def main(wave_paths=WAVE_PATHS, rename=None, recode=None):
+    taiwan_map = load_taiwan_map()
+    if wave_paths:
+        waves, gender_pct, usage_pct = wave_percentages(ingest_waves(wave_paths, rename, recode))
+        return build_animated_figure(taiwan_map, waves, gender_pct, usage_pct)
+    if DATA_PATH:
+        return build_figure(taiwan_map, *regional_percentages(pd.read_csv(DATA_PATH)))
+    return build_figure(taiwan_map, gender_data, internet_usage)
+
+if __name__ == "__main__":
+    fig = main()
+    fig.show()
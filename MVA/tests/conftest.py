@@ -0,0 +1,10 @@
+import os
+import sys
+
+MVA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PCA_DIR = os.path.join(MVA_DIR, 'PCA')
+
+# 與各腳本相同，PCA 目錄下的模組以裸名稱互相匯入
+for path in (MVA_DIR, PCA_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from PCA_approx import SketchPCA
+
+
+def _correlated(n=500, p=10, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, p)) @ rng.normal(size=(p, p))
+
+
+@pytest.mark.parametrize('k', [10, 4])
+def test_angle_bounds_for_all_and_partial_components(k):
+    X = _correlated()
+    pca = SketchPCA(n_components=k, sketch_size=8).fit_stream(np.array_split(X, 5))
+    assert pca.components_.shape == (k, 10)
+    assert pca.angle_bound_.shape == (k,)
+    assert np.all((pca.angle_bound_ >= 0) & (pca.angle_bound_ <= 1))
+
+
+@pytest.mark.parametrize('k', [10, 4])
+def test_exact_mode_matches_covariance_eigenvalues(k):
+    X = _correlated()
+    pca = SketchPCA(n_components=k, exact=True).fit_stream(np.array_split(X, 5))
+    eigvals = np.sort(np.linalg.eigvalsh(np.cov(X, rowvar=False)))[::-1][:k]
+    np.testing.assert_allclose(pca.explained_variance_, eigvals, rtol=1e-8)
+    assert np.all(pca.angle_bound_ == 0)
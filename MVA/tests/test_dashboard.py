@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from PCA_score_store import PCScoreStore
+from dashboard import MISSING_LABEL, DashboardData
+
+
+def _store(tmp_path, n=120, seed=0):
+    """模擬得分存放區，internet_usage 與 region 各有部分缺失"""
+    rng = np.random.default_rng(seed)
+    scores = pd.DataFrame(rng.normal(size=(n, 2)), columns=['PC1', 'PC2'])
+    demographics = pd.DataFrame({
+        'gender_label': pd.Categorical(rng.choice(['男性', '女性'], size=n)),
+        'region': pd.Categorical(rng.choice(['北部', '南部'], size=n)),
+        'age_group': pd.Categorical(rng.choice(['33-63', '63-73'], size=n)),
+        'internet_usage': pd.Categorical(rng.choice(['0-3h', '3-6h'], size=n)),
+    })
+    demographics.loc[:9, 'internet_usage'] = np.nan
+    demographics.loc[5:14, 'region'] = np.nan
+    return PCScoreStore.write(str(tmp_path / 'store'), scores, demographics)
+
+
+def test_missing_dimension_keeps_respondents(tmp_path):
+    data = DashboardData(_store(tmp_path), n_bins=20)
+    assert data.counts.sum() == 120
+    assert data.levels['internet_usage'][-1] == MISSING_LABEL
+    assert MISSING_LABEL not in data.levels['gender_label']
+
+    labels, counts = data.distribution('internet_usage', {})
+    assert dict(zip(labels, counts))[MISSING_LABEL] == 10
+    # 只篩選上網時間時，缺少地區的受訪者仍計入
+    labels, counts = data.distribution('region', {'internet_usage': ['0-3h', '3-6h']})
+    assert counts.sum() == 110
+    assert dict(zip(labels, counts))[MISSING_LABEL] == 5
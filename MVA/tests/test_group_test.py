@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import f_oneway, kruskal
+
+from PCA_group_test import GroupComparison, _group_codes
+
+
+def _scores(n=300, seed=0):
+    """模擬 PC 得分與分組欄位，region 含一個缺失值"""
+    rng = np.random.default_rng(seed)
+    pc_scores = pd.DataFrame(rng.normal(size=(n, 2)), columns=['PC1', 'PC2'])
+    pc_scores['gender_label'] = rng.choice(['男性', '女性'], size=n)
+    pc_scores['region'] = pd.Series(rng.choice(['北部', '中部', '南部'], size=n), dtype=object)
+    pc_scores.loc[[0, 7], 'PC1'] += 1.0
+    pc_scores.loc[5, 'region'] = np.nan
+    return pc_scores
+
+
+def test_interaction_codes_skip_missing():
+    pc_scores = _scores()
+    codes, levels = _group_codes(pc_scores, ('gender_label', 'region'))
+    assert codes[5] == -1
+    assert len(levels) == 6
+    keys = pc_scores['gender_label'] + ' × ' + pc_scores['region']
+    valid = codes >= 0
+    assert (np.array(levels)[codes[valid]] == keys[valid].to_numpy()).all()
+
+
+@pytest.mark.parametrize('grouping', ['region', ('gender_label', 'region')])
+def test_overall_statistics_match_scipy(grouping):
+    pc_scores = _scores()
+    results = GroupComparison(pc_scores, pc_cols=['PC1', 'PC2'], groupings=[grouping]).run(n_perm=0)
+    overall = results[results['comparison'] == 'overall'].set_index(['pc', 'test'])['statistic']
+
+    cols = [grouping] if isinstance(grouping, str) else list(grouping)
+    groups = pc_scores.dropna(subset=cols).groupby(cols)
+    for pc in ['PC1', 'PC2']:
+        samples = [g[pc].to_numpy() for _, g in groups]
+        assert overall[pc, 'ANOVA'] == pytest.approx(f_oneway(*samples).statistic, rel=1e-10)
+        assert overall[pc, 'Kruskal-Wallis'] == pytest.approx(kruskal(*samples).statistic, rel=1e-10)
+
+
+def test_permutation_batches_respect_element_budget(monkeypatch):
+    import PCA_group_test
+
+    pc_scores = _scores(n=500)
+    batch_sizes = []
+    original = PCA_group_test._permutation_batch
+
+    def recording_batch(codes, values, counts, n_perm, seed):
+        batch_sizes.append(n_perm)
+        return original(codes, values, counts, n_perm, seed)
+
+    monkeypatch.setattr(PCA_group_test, '_permutation_batch', recording_batch)
+    results = GroupComparison(pc_scores, pc_cols=['PC1', 'PC2'], groupings=['region']).run(
+        n_perm=99, n_jobs=1, max_elements=10_000)
+
+    n = pc_scores['region'].notna().sum()
+    assert sum(batch_sizes) == 99
+    assert len(batch_sizes) > 1
+    assert max(batch_sizes) * n <= 10_000
+    perm_p = results.loc[results['comparison'] == 'overall', 'perm_p_value']
+    assert perm_p.between(1 / 100, 1).all()
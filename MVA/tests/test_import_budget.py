@@ -0,0 +1,28 @@
+import importlib.util
+
+import pytest
+
+import cli
+
+
+def test_cli_loads_only_stdlib():
+    cumulative_ms, loaded, error = cli.measure_imports()
+    assert error is None
+    # 只檢查沒有載入重型套件；牆鐘時間在忙碌的 CI 機器上不穩定，由 import-budget 子命令檢查
+    assert 'cli' in cumulative_ms
+    assert not loaded & set(cli.HEAVY_MODULES)
+
+
+@pytest.mark.parametrize('command', sorted(cli.SUBCOMMAND_IMPORTS))
+def test_subcommand_import_budget(command):
+    modules, forbidden, budget = cli.SUBCOMMAND_IMPORTS[command]
+    cumulative_ms, loaded, error = cli.measure_imports(modules)
+    if error and 'ModuleNotFoundError' in error:
+        missing = error.split("'")[1]
+        if importlib.util.find_spec(missing) is None:
+            pytest.skip(f'{missing} 未安裝')
+    assert error is None
+
+    # 子命令第一層匯入的模組不得順帶載入與其無關的重型套件
+    assert not loaded & set(forbidden), sorted(loaded & set(forbidden))
+    assert sum(cumulative_ms.get(module, 0) for module in modules) < budget
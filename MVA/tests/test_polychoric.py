@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import PCA_polychoric
+from PCA_polychoric import nearest_positive_definite, polychoric_correlation
+
+
+def test_nearest_positive_definite_guarantees_cholesky():
+    rng = np.random.default_rng(0)
+    for n_iter in [1, 2, 100]:
+        A = rng.uniform(-1, 1, size=(15, 15))
+        R = (A + A.T) / 2
+        np.fill_diagonal(R, 1.0)
+        Y = nearest_positive_definite(R, n_iter=n_iter)
+        np.linalg.cholesky(Y)
+        assert np.allclose(np.diag(Y), 1.0)
+        assert np.allclose(Y, Y.T)
+
+
+def test_cache_persists_across_processes(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    latent = rng.normal(size=(300, 1))
+    X = pd.DataFrame(np.clip(np.round(latent + rng.normal(size=(300, 4)) + 3), 1, 5),
+                     columns=['a', 'b', 'c', 'd'])
+
+    first = polychoric_correlation(X, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    # 模擬新的行程：清空記憶體快取，且不允許重新估計
+    monkeypatch.setattr(PCA_polychoric, '_CACHE', {})
+    monkeypatch.setattr(PCA_polychoric, '_fit_pairs', None)
+    second = polychoric_correlation(X, cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(first, second)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+import PCA_reliability
+from PCA_reliability import ReliabilityAnalyzer
+
+
+def _likert_sample(n, seed=0):
+    """兩個量表、各 4 題的模擬 Likert 資料與兩個分組欄位"""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n, 2))
+    items = {}
+    for s, scale in enumerate(['a', 'b']):
+        for i in range(4):
+            latent = factors[:, s] + rng.normal(scale=0.8, size=n)
+            items[f'{scale}{i}'] = np.clip(np.round(latent + 3), 1, 5)
+    X = pd.DataFrame(items)
+    groups = pd.DataFrame({
+        'gender': rng.choice(['男', '女'], size=n),
+        'region': rng.choice(['北部', '中部', '南部'], size=n),
+    })
+    scales = {'a': [f'a{i}' for i in range(4)], 'b': [f'b{i}' for i in range(4)]}
+    return X, scales, groups
+
+
+def _alpha(values):
+    C = np.cov(values, rowvar=False)
+    k = C.shape[0]
+    return k / (k - 1) * (1 - np.trace(C) / C.sum())
+
+
+def test_chunks_respect_element_budget(monkeypatch):
+    X, scales, groups = _likert_sample(5000)
+    calls = []
+    original = PCA_reliability._batched_covariances
+
+    def recording(values, weight_block, M, chunksize=20000):
+        def block(start, stop):
+            w = weight_block(start, stop)
+            calls.append(w.size)
+            return w
+        return original(values, block, M, chunksize)
+
+    monkeypatch.setattr(PCA_reliability, '_batched_covariances', recording)
+    budget = 50000
+    analyzer = ReliabilityAnalyzer(X, scales, groups=groups)
+    scale_results, _ = analyzer.run(n_boot=200, max_elements=budget)
+
+    # 樣本大於單批列數，且每批權重矩陣都在預算內
+    assert len(calls) > 1
+    assert max(calls) <= budget
+
+    # 分批不影響點估計
+    overall = scale_results[scale_results['grouping'] == '全體'].set_index('scale')
+    for scale, items in scales.items():
+        assert np.isclose(overall.loc[scale, 'alpha'], _alpha(X[items].to_numpy()))
+
+    subgroup = scale_results[(scale_results['grouping'] == 'region') &
+                             (scale_results['group'] == '南部')].set_index('scale')
+    mask = (groups['region'] == '南部').to_numpy()
+    assert np.isclose(subgroup.loc['a', 'alpha'], _alpha(X.loc[mask, scales['a']].to_numpy()))
+    assert (scale_results['alpha_lower'] <= scale_results['alpha']).all()
+    assert (scale_results['alpha'] <= scale_results['alpha_upper']).all()
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from PCA_score_store import open_or_build
+
+
+def _survey(n=200, seed=0):
+    """含 17 題態度題目與人口變數的模擬問卷"""
+    rng = np.random.default_rng(seed)
+    cols = ([f'q22_0{i}_1' for i in range(1, 6)] + [f'q23_0{i}_1' for i in range(1, 6)] +
+            [f'q25_0{i}_1' for i in range(1, 5)] + [f'q26_0{i}_1' for i in range(1, 4)])
+    latent = rng.normal(size=(n, 1))
+    items = np.clip(np.round(latent + rng.normal(size=(n, len(cols))) + 3), 1, 5)
+    df = pd.DataFrame(items, columns=cols)
+    df.insert(0, 'id', np.arange(n))
+    df['q1'] = rng.integers(1, 3, size=n).astype(float)
+    df['q2'] = rng.integers(40, 90, size=n)
+    df['q3'] = rng.integers(1, 25, size=n)
+    return df
+
+
+def test_store_rebuilt_when_source_changes(tmp_path):
+    data = tmp_path / 'survey.csv'
+    store_dir = str(tmp_path / 'store')
+    df = _survey()
+    df.to_csv(data, index=False)
+
+    store = open_or_build(str(data), store_dir, n_imputations=2)
+    first = np.array(store.scores)
+
+    # 只更新修改時間、內容不變：沿用既有存放區
+    os.utime(data)
+    assert open_or_build(str(data), store_dir, n_imputations=2).meta['source'] == store.meta['source']
+
+    # 內容改變（例如新增受訪者）：重新建立
+    pd.concat([df, _survey(50, seed=1).assign(id=lambda d: d['id'] + 1000)]).to_csv(data, index=False)
+    rebuilt = open_or_build(str(data), store_dir, n_imputations=2)
+    assert rebuilt.meta['n_rows'] == len(first) + 50
+    assert rebuilt.meta['source']['sha1'] != store.meta['source']['sha1']
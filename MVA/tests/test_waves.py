@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from PCA_waves import WaveComparison
+
+
+def _weighted_survey(n=300, seed=0):
+    """含 17 題態度題目、受訪者 ID 與不均等調查權重的模擬問卷"""
+    rng = np.random.default_rng(seed)
+    cols = ([f'q22_0{i}_1' for i in range(1, 6)] + [f'q23_0{i}_1' for i in range(1, 6)] +
+            [f'q25_0{i}_1' for i in range(1, 5)] + [f'q26_0{i}_1' for i in range(1, 4)])
+    latent = rng.normal(size=(n, 2))
+    items = latent @ rng.normal(size=(2, len(cols))) + rng.normal(size=(n, len(cols)))
+    df = pd.DataFrame(np.clip(np.round(items + 3), 1, 5), columns=cols)
+    df.insert(0, 'id', np.arange(n))
+    df['weight'] = rng.uniform(0.2, 3.0, size=n)
+    return df
+
+
+def test_projection_uses_weighted_standardization():
+    waves = WaveComparison(n_components=3)
+    analyzer = waves.fit_wave('w1', _weighted_survey())
+    waves.fit_wave('w2', _weighted_survey(seed=1))
+
+    scores = waves.project().loc['w1']
+    # 參考波次投影後的得分應與加權 PCA 估計時的得分相同
+    np.testing.assert_allclose(scores.to_numpy(), np.asarray(analyzer.X_pca)[:, :3], atol=1e-8)